@@ -9,16 +9,19 @@ I HOPE YOU LIKE IT.
 
 # MODULES
 import pygame
+import multiprocessing
 from audio import mixer
 from scripts import intro
 
-# PYGAME WINDOW
-pygame.init()
-SCREEN = pygame.display.set_mode((0, 0), pygame.FULLSCREEN)
-# SCREEN = pygame.display.set_mode((960, 540))
-
-# MAIN LOOP
+# MAIN LOOP, THE ENGINE PROCESSES IMPORT THIS FILE TOO SO THE WINDOW IS ONLY OPENED HERE
 if __name__ == '__main__':
+    multiprocessing.freeze_support()
+
+    # PYGAME WINDOW
+    pygame.init()
+    SCREEN = pygame.display.set_mode((0, 0), pygame.FULLSCREEN)
+    # SCREEN = pygame.display.set_mode((960, 540))
+
     MIXER = mixer.Mixer(__file__)
     INTRO = intro.Intro(SCREEN, MIXER, __file__)
 
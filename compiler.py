@@ -4,6 +4,7 @@ import os
 
 os.system('pyinstaller --noconfirm --onefile --windowed --add-data\
           "C:/Users/Lenovo/Python/Games/Star Chess/audio;audio/"\
+          --add-data "C:/Users/Lenovo/Python/Games/Star Chess/engine;engine/"\
           --add-data "C:/Users/Lenovo/Python/Games/Star Chess/font;font/"\
           --add-data "C:/Users/Lenovo/Python/Games/Star Chess/images;images/"\
           --add-data "C:/Users/Lenovo/Python/Games/Star Chess/pieces;pieces/"\
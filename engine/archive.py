@@ -0,0 +1,214 @@
+"""Append-only archive of games as one byte per ply, with an offset index for random access
+
+    python -m engine.archive info games.scga                  counts the games, plies and results
+    python -m engine.archive pgn games.scga -o games.pgn      exports the games as PGN
+    python -m engine.archive pgn games.scga --first 10 -n 5   exports five games from the tenth
+
+    Every ply is the index of the move among the sorted legal moves of its position, so games are replayed to read them
+"""
+
+import os
+import sys
+import mmap
+import struct
+import argparse
+from collections import Counter
+from engine import pgn
+from engine.pgn import RESULTS
+from engine.position import Position, START_FEN
+
+# FORMAT, A HEADER AND THEN EVERY GAME AS ITS RESULT, THE LENGTH OF ITS FEN, ITS PLIES, THE FEN AND ONE BYTE PER PLY
+MAGIC = b'SCGA'
+VERSION = 2
+HEADER = struct.Struct('<4sH')
+GAME = struct.Struct('<BBH')
+
+# INDEX, A FILE NEXT TO THE ARCHIVE WITH THE OFFSET OF EVERY GAME
+INDEX_EXTENSION = '.idx'
+OFFSET = struct.Struct('<Q')
+
+# BUFFER OF THE WRITER
+BUFFER_SIZE = 1 << 20
+
+
+def encode(game_moves: list[int], fen: str=START_FEN) -> bytes:
+    """Returns the index of every move among the sorted legal moves of its position"""
+    position = Position(fen)
+    indices = bytearray()
+    for move in game_moves:
+        indices.append(sorted(position.legal_moves()).index(move))
+        position.make(move)
+    return bytes(indices)
+
+
+def decode(indices: bytes, fen: str=START_FEN) -> list[int]:
+    """Returns the moves of the indices replayed from the position"""
+    position = Position(fen)
+    game_moves = list()
+    for index in indices:
+        game_moves.append(move := sorted(position.legal_moves())[index])
+        position.make(move)
+    return game_moves
+
+
+def scan(data) -> list[int]:
+    """Returns the offset of every game of the archive mapped in the buffer by walking its records"""
+    offsets = list()
+    offset = HEADER.size
+    while offset + GAME.size <= len(data):
+        _, length, plies = GAME.unpack_from(data, offset)
+        if offset + GAME.size + length + plies > len(data): break
+        offsets.append(offset)
+        offset += GAME.size + length + plies
+    return offsets
+
+
+def valid_index(path: str) -> bool:
+    """Checks that the index of an archive is whole and its last game ends where the archive does"""
+    index_path = path + INDEX_EXTENSION
+    if not os.path.exists(index_path) or os.path.getsize(index_path) % OFFSET.size: return False
+    size = os.path.getsize(path)
+    if not os.path.getsize(index_path): return size == HEADER.size
+    with open(index_path, 'rb') as f:
+        f.seek(-OFFSET.size, os.SEEK_END)
+        offset = OFFSET.unpack(f.read(OFFSET.size))[0]
+    if offset + GAME.size > size: return False
+    with open(path, 'rb') as f:
+        f.seek(offset)
+        _, length, plies = GAME.unpack(f.read(GAME.size))
+    return offset + GAME.size + length + plies == size
+
+
+def rebuild_index(path: str) -> None:
+    """Writes the index of an archive again from its records"""
+    with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+        offsets = scan(data)
+    with open(path + INDEX_EXTENSION, 'wb', buffering=BUFFER_SIZE) as f:
+        for offset in offsets: f.write(OFFSET.pack(offset))
+
+
+class ArchiveWriter:
+    """Appends games to an archive and its index with buffered writes, creating them if needed"""
+    def __init__(self, path: str):
+        index_path = path + INDEX_EXTENSION
+        new = not os.path.exists(path) or not os.path.getsize(path)
+
+        # AN INDEX THAT DOES NOT MATCH THE ARCHIVE IS WRITTEN AGAIN FROM ITS RECORDS
+        if not new and not valid_index(path): rebuild_index(path)
+
+        self.file = open(path, 'ab', buffering=BUFFER_SIZE)
+        self.index = open(index_path, 'wb' if new else 'ab', buffering=BUFFER_SIZE)
+        if new: self.file.write(HEADER.pack(MAGIC, VERSION))
+        self.offset = self.file.tell()
+
+    def write(self, game_moves: list[int], result: str, fen: str=START_FEN) -> None:
+        """Appends one game"""
+        start = b'' if fen == START_FEN else fen.encode()
+        indices = encode(game_moves, fen)
+        record = GAME.pack(RESULTS.index(result), len(start), len(indices)) + start + indices
+        self.file.write(record)
+        self.index.write(OFFSET.pack(self.offset))
+        self.offset += len(record)
+
+    def close(self) -> None:
+        """Flushes and closes the files, the archive first so the index never points past it"""
+        self.file.close()
+        self.index.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+
+class Archive:
+    """Games of an archive and its index mapped in memory, any game is read without reading the ones before"""
+    def __init__(self, path: str):
+        self.file = open(path, 'rb')
+        self.data = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version = HEADER.unpack_from(self.data, 0)
+        if magic != MAGIC or version != VERSION: raise ValueError(f'{path} is not a game archive of version {VERSION}')
+
+        # WITHOUT A VALID INDEX THE OFFSETS ARE FOUND WALKING THE MAPPED RECORDS
+        index_path = path + INDEX_EXTENSION
+        if valid_index(path) and os.path.getsize(index_path):
+            with open(index_path, 'rb') as f:
+                self.index = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        else: self.index = b''.join(OFFSET.pack(offset) for offset in scan(self.data))
+        self.count = len(self.index) // OFFSET.size
+
+    def entry(self, number: int) -> tuple[str, str, bytes]:
+        """Returns the result, starting position and move indices of a game without replaying it"""
+        if not 0 <= number < self.count: raise IndexError(f'game {number} out of {self.count}')
+        offset = OFFSET.unpack_from(self.index, number * OFFSET.size)[0]
+        result, length, plies = GAME.unpack_from(self.data, offset)
+        offset += GAME.size
+        fen = self.data[offset:offset+length].decode() if length else START_FEN
+        return RESULTS[result], fen, self.data[offset+length:offset+length+plies]
+
+    def game(self, number: int) -> tuple[list[int], str, str]:
+        """Returns the moves, result and starting position of a game"""
+        result, fen, indices = self.entry(number)
+        return decode(indices, fen), result, fen
+
+    def close(self) -> None:
+        """Unmaps the files"""
+        if isinstance(self.index, mmap.mmap): self.index.close()
+        self.data.close()
+        self.file.close()
+
+    def __len__(self) -> int:
+        return self.count
+
+    def __iter__(self):
+        return (self.game(number) for number in range(self.count))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+
+def read_archive(path: str):
+    """Yields the moves, result and starting position of every game of an archive"""
+    with Archive(path) as archive: yield from archive
+
+
+def main(argv: list[str]=None) -> int:
+    """Describes or exports an archive, returns the exit code"""
+    parser = argparse.ArgumentParser(prog='python -m engine.archive', description='Game archive of Star Chess')
+    commands = parser.add_subparsers(dest='command', required=True)
+    info = commands.add_parser('info', help='count the games, plies and results')
+    info.add_argument('path')
+    exporter = commands.add_parser('pgn', help='export the games as PGN')
+    exporter.add_argument('path')
+    exporter.add_argument('-o', '--output', help='PGN file the games are appended to, the screen by default')
+    exporter.add_argument('--first', type=int, default=0, help='number of the first game')
+    exporter.add_argument('-n', '--games', type=int, help='games to export, all by default')
+    args = parser.parse_args(argv)
+
+    with Archive(args.path) as archive:
+        if args.command == 'info':
+            results, plies = Counter(), 0
+            for number in range(len(archive)):
+                result, _, indices = archive.entry(number)
+                results[result] += 1
+                plies += len(indices)
+            size = os.path.getsize(args.path)
+            print(f'{len(archive)} games, {plies} plies, {size} bytes, {size / max(plies, 1):.2f} bytes per ply')
+            print(', '.join(f'{result} {results[result]}' for result in RESULTS))
+            return 0
+
+        last = len(archive) if args.games is None else min(len(archive), args.first + args.games)
+        output = open(args.output, 'a', encoding='utf-8') if args.output else sys.stdout
+        for number in range(args.first, last):
+            game_moves, result, fen = archive.game(number)
+            output.write(pgn.format_game(game_moves, result, {'Round': str(number + 1)}, fen))
+        if args.output: output.close()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,72 @@
+"""Attacker counts per square kept up to date move by move"""
+
+from engine.bitboard import *
+
+
+class AttackMap:
+    """Counts how many pieces of each team attack every square"""
+    def __init__(self, bitboards: Bitboards):
+        self.bitboards = bitboards
+        self.rebuild()
+
+    def rebuild(self) -> None:
+        """Recalculates the attacks of every piece"""
+        self.counts = ([0]*64, [0]*64)
+        self.masks = [0, 0]
+        self.sources = [0]*64
+        self.owners = [-1]*64
+        for sq in squares(self.bitboards.occupied): self.add(sq)
+
+    def piece_attacks(self, team: int, kind: int, sq: int) -> int:
+        """Returns the squares attacked by a piece with the current occupancy"""
+        occupied = self.bitboards.occupied
+        if kind == PAWN: return PAWN_ATTACKS[team][sq]
+        if kind == KNIGHT: return KNIGHT_ATTACKS[sq]
+        if kind == BISHOP: return bishop_attacks(sq, occupied)
+        if kind == ROOK: return rook_attacks(sq, occupied)
+        if kind == QUEEN: return queen_attacks(sq, occupied)
+        return KING_ATTACKS[sq]
+
+    def add(self, sq: int) -> None:
+        """Adds the attacks of the piece standing on the given square"""
+        team, kind = self.bitboards.piece_at(sq)
+        attacks = self.piece_attacks(team, kind, sq)
+        counts = self.counts[team]
+        for target in squares(attacks): counts[target] += 1
+        self.masks[team] |= attacks
+        self.sources[sq] = attacks
+        self.owners[sq] = team
+
+    def discard(self, sq: int) -> None:
+        """Removes the attacks recorded for the given square"""
+        team = self.owners[sq]
+        counts = self.counts[team]
+        for target in squares(self.sources[sq]):
+            counts[target] -= 1
+            if not counts[target]: self.masks[team] &= ~(1 << target)
+        self.sources[sq] = 0
+        self.owners[sq] = -1
+
+    def update(self, changed: int) -> None:
+        """Refreshes the pieces on the changed squares and the sliders that see them"""
+        pieces = self.bitboards.pieces
+        sliders = 0
+        for team in (WHITE, BLACK):
+            sliders |= pieces[team][BISHOP] | pieces[team][ROOK] | pieces[team][QUEEN]
+
+        # A SLIDER IS AFFECTED WHEN ITS RAY REACHES A CHANGED SQUARE
+        dirty = changed
+        for sq in squares(sliders & ~changed):
+            if self.sources[sq] & changed: dirty |= 1 << sq
+
+        for sq in squares(dirty):
+            if self.owners[sq] >= 0: self.discard(sq)
+        for sq in squares(dirty & self.bitboards.occupied): self.add(sq)
+
+    def count(self, sq: int, team: int) -> int:
+        """Returns how many pieces of the team attack the square"""
+        return self.counts[team][sq]
+
+    def attacked(self, sq: int, team: int) -> bool:
+        """Checks if the team attacks the square"""
+        return self.counts[team][sq] > 0
@@ -0,0 +1,176 @@
+"""Vectorized evaluation of many positions at once with NumPy, for self-play and datasets
+
+    python -m engine.batch                     benchmarks the batches against the scalar evaluation of the engine
+    python -m engine.batch -n 50000 -b 4096    more positions and a bigger batch
+"""
+
+import sys
+import time
+import random
+import argparse
+import numpy as np
+from engine.bitboard import *
+from engine.evaluation import evaluate as evaluate_scalar
+from engine.tables import MIDDLE_SCORES, END_SCORES, CODE_PHASES, MAX_PHASE
+from engine.position import Position, EMPTY
+
+# BOARDS ARE UINT8[N,64] OF CODE+1, 0 IS AN EMPTY SQUARE SO ITS BITBOARD IS THE EMPTY ONE
+
+# WEIGHTS, CENTIPAWNS PER ATTACKED SQUARE AND PER KING SAFETY FEATURE
+MOBILITY = (0, 4, 5, 2, 1, 0)
+SHIELD_BONUS = 10
+ZONE_PENALTY = 15
+
+# MIDDLEGAME AND ENDGAME SCORE OF EVERY CODE+1 ON EVERY SQUARE FOR WHITE, FLAT SO CODE << 6 | SQUARE READS IT
+MIDDLE_TABLE = np.zeros((13, 64), np.int16)
+MIDDLE_TABLE[1:] = MIDDLE_SCORES
+MIDDLE_TABLE = MIDDLE_TABLE.ravel()
+END_TABLE = np.zeros((13, 64), np.int16)
+END_TABLE[1:] = END_SCORES
+END_TABLE = END_TABLE.ravel()
+PHASE_TABLE = np.array([0] + CODE_PHASES, np.int32)
+SQUARES = np.arange(64, dtype=np.uint16)
+
+# SHIFTS OF EVERY DIRECTION AND THE SQUARES THEY MAY REACH WITHOUT WRAPPING AROUND THE BOARD
+FILE_A = 0x0101010101010101
+FILE_H = FILE_A << 7
+FILE_AB = FILE_A | (FILE_A << 1)
+FILE_GH = FILE_H | (FILE_H >> 1)
+WRAP = {-2: ~FILE_GH & FULL, -1: ~FILE_H & FULL, 0: FULL, 1: ~FILE_A & FULL, 2: ~FILE_AB & FULL}
+SLIDES = {kind: [(dy*8 + dx, np.uint64(WRAP[dx])) for dx, dy in directions] for kind, directions in ((BISHOP, DIAGONALS), (ROOK, ORTHOGONALS))}
+JUMPS = [(dy*8 + dx, np.uint64(WRAP[dx])) for dx, dy in ((1, 2), (2, 1), (2, -1), (1, -2), (-1, -2), (-2, -1), (-2, 1), (-1, 2))]
+
+# KING SURROUNDINGS, THE ZONE IS TWO SQUARES AROUND AND THE SHIELD THE TWO RANKS IN FRONT
+ZONES = np.array([sum(1 << target for target in range(64) if max(abs((sq & 7) - (target & 7)), abs((sq >> 3) - (target >> 3))) <= 2) for sq in range(64)], np.uint64)
+SHIELDS = np.array([
+    [sum(1 << target for target in range(64) if abs((sq & 7) - (target & 7)) <= 1 and 1 <= ((sq >> 3) - (target >> 3)) * (1 if team == WHITE else -1) <= 2) for sq in range(64)]
+    for team in (WHITE, BLACK)
+], np.uint64)
+
+# BITS SET IN EVERY BYTE, ONLY USED BY NUMPY VERSIONS WITHOUT BITWISE_COUNT
+POPCOUNT = np.array([bin(byte).count('1') for byte in range(256)], np.uint8)
+MOBILITY_WEIGHTS = np.array([MOBILITY[kind] for kind in (KNIGHT, BISHOP, ROOK, QUEEN)], np.int32)
+
+
+def encode(positions: list[Position]) -> np.ndarray:
+    """Returns the uint8[N,64] boards of the positions"""
+    return (np.array([position.squares for position in positions], np.int16) - EMPTY).astype(np.uint8)
+
+
+def bitboards(boards: np.ndarray) -> np.ndarray:
+    """Returns the uint64[13,N] bitboards of every code+1 of the boards"""
+    planes = boards[None, :, :] == np.arange(13, dtype=np.uint8)[:, None, None]
+    return np.packbits(planes, axis=2, bitorder='little').view('<u8')[:, :, 0]
+
+
+def popcount(bitboards: np.ndarray) -> np.ndarray:
+    """Returns the squares set in every bitboard"""
+    if hasattr(np, 'bitwise_count'): return np.bitwise_count(bitboards).astype(np.int32)
+    return POPCOUNT[bitboards.view(np.uint8)].reshape(*bitboards.shape, 8).sum(axis=-1, dtype=np.int32)
+
+
+def shift(bitboards: np.ndarray, offset: int) -> np.ndarray:
+    """Moves every square by the offset, squares leaving the board are lost"""
+    return bitboards << np.uint64(offset) if offset > 0 else bitboards >> np.uint64(-offset)
+
+
+def slider_attacks(sliders: np.ndarray, empty: np.ndarray, kind: int) -> np.ndarray:
+    """Returns the squares attacked by the sliders of a kind with Kogge-Stone fills, stopping on the first piece"""
+    attacks = np.zeros_like(sliders)
+    for offset, wrap in SLIDES[kind]:
+        fill, open_squares = sliders, empty & wrap
+        fill = fill | (open_squares & shift(fill, offset))
+        open_squares = open_squares & shift(open_squares, offset)
+        fill = fill | (open_squares & shift(fill, 2*offset))
+        open_squares = open_squares & shift(open_squares, 2*offset)
+        fill = fill | (open_squares & shift(fill, 4*offset))
+        attacks |= shift(fill, offset) & wrap
+    return attacks
+
+
+def mobility(pieces: np.ndarray, team: int, empty: np.ndarray) -> np.ndarray:
+    """Returns the weighted squares the knights and sliders of the team attack, each kind counts a square once"""
+    first = team * 6 + 1
+    own = np.bitwise_or.reduce(pieces[first:first+6], axis=0)
+    knights = np.zeros_like(own)
+    for offset, wrap in JUMPS: knights |= shift(pieces[first + KNIGHT], offset) & wrap
+    bishops = slider_attacks(pieces[first + BISHOP], empty, BISHOP)
+    rooks = slider_attacks(pieces[first + ROOK], empty, ROOK)
+    queens = slider_attacks(pieces[first + QUEEN], empty, BISHOP) | slider_attacks(pieces[first + QUEEN], empty, ROOK)
+
+    return MOBILITY_WEIGHTS @ popcount(np.stack((knights, bishops, rooks, queens)) & ~own)
+
+
+def king_safety(boards: np.ndarray, pieces: np.ndarray, team: int) -> np.ndarray:
+    """Returns the pawns in front of the king minus the enemy pieces around it, weighted"""
+    first = team * 6 + 1
+    enemy = 7 - team * 6
+    kings = boards == first + KING
+    king = kings.argmax(axis=1)
+    attackers = np.bitwise_or.reduce(pieces[enemy + KNIGHT:enemy + KING], axis=0)
+    shield = popcount(SHIELDS[team][king] & pieces[first + PAWN])
+    near = popcount(ZONES[king] & attackers)
+    return np.where(kings.any(axis=1), SHIELD_BONUS * shield - ZONE_PENALTY * near, 0)
+
+
+def evaluate(boards: np.ndarray, turns: np.ndarray=None, with_mobility: bool=True, with_king_safety: bool=True) -> np.ndarray:
+    """Returns the int16[N] scores of the boards for white, or for the side to move if the turns are given"""
+    boards = np.asarray(boards, np.uint8)
+    indices = (boards.astype(np.uint16) << 6) | SQUARES
+    middlegame = MIDDLE_TABLE[indices].sum(axis=1, dtype=np.int32)
+    endgame = END_TABLE[indices].sum(axis=1, dtype=np.int32)
+    phase = np.minimum(PHASE_TABLE[boards].sum(axis=1), MAX_PHASE)
+    score = (middlegame * phase + endgame * (MAX_PHASE - phase)) // MAX_PHASE
+    if with_mobility or with_king_safety: pieces = bitboards(boards)
+    if with_mobility: score += mobility(pieces, WHITE, pieces[0]) - mobility(pieces, BLACK, pieces[0])
+    if with_king_safety: score += king_safety(boards, pieces, WHITE) - king_safety(boards, pieces, BLACK)
+    if turns is not None: score = np.where(np.asarray(turns) == WHITE, score, -score)
+    return np.clip(score, -32768, 32767).astype(np.int16)
+
+
+def sample(count: int, seed: int=0) -> list[Position]:
+    """Returns positions of random games, every ply is one position"""
+    rng = random.Random(seed)
+    positions = list()
+    position = Position()
+    while len(positions) < count:
+        legal_moves = position.legal_moves()
+        if not legal_moves or len(position.history) >= 200:
+            position = Position()
+            continue
+        position.make(rng.choice(legal_moves))
+        positions.append(Position(position.fen()))
+    return positions
+
+
+def main(argv: list[str]=None) -> int:
+    """Compares the positions per second of the running totals the search evaluates and of the batches"""
+    parser = argparse.ArgumentParser(prog='python -m engine.batch', description='Batch evaluation benchmark of Star Chess')
+    parser.add_argument('-n', '--positions', type=int, default=20000, help='positions of random games to score')
+    parser.add_argument('-b', '--batch', type=int, nargs='+', default=[256, 1024, 4096], help='batch sizes')
+    parser.add_argument('-s', '--seed', type=int, default=0)
+    args = parser.parse_args(argv)
+
+    positions = sample(args.positions, args.seed)
+    boards = encode(positions)
+    turns = np.array([position.turn for position in positions])
+
+    start = time.perf_counter()
+    scalar = [evaluate_scalar(position) for position in positions]
+    scalar_speed = len(positions) / (time.perf_counter() - start)
+    print(f'scalar: {scalar_speed:,.0f} positions/s, material and tables only, without mobility or king safety')
+
+    # TAPERED MATERIAL AND TABLES ALONE MUST MATCH THE SCALAR EVALUATION
+    same = np.array_equal(evaluate(boards, turns, False, False), np.array(scalar, np.int16))
+    print(f'material and tables match the scalar scores: {same}')
+
+    for size in args.batch:
+        start = time.perf_counter()
+        for i in range(0, len(boards), size): evaluate(boards[i:i+size], turns[i:i+size])
+        speed = len(boards) / (time.perf_counter() - start)
+        print(f'batch {size}: {speed:,.0f} positions/s, {speed / scalar_speed:.1f}x scalar')
+    return 0 if same else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,259 @@
+"""Bitboard tables and position core used by the rules engine"""
+
+# TEAMS
+WHITE, BLACK = 0, 1
+TEAMS = ('white', 'black')
+
+# PIECE TYPES
+PAWN, KNIGHT, BISHOP, ROOK, QUEEN, KING = range(6)
+
+# MASKS
+FULL = (1 << 64) - 1
+RANK_8 = 0xFF
+RANK_1 = RANK_8 << 56
+START_RANKS = (0xFF << 48, 0xFF << 8)
+
+# DIRECTIONS AS (DX, DY), SQUARE = Y*8 + X SO Y=0 IS THE BLACK BACK RANK
+NORTH, SOUTH, WEST, EAST = (0, -1), (0, 1), (-1, 0), (1, 0)
+NORTHWEST, NORTHEAST, SOUTHWEST, SOUTHEAST = (-1, -1), (1, -1), (-1, 1), (1, 1)
+ORTHOGONALS = (NORTH, SOUTH, WEST, EAST)
+DIAGONALS = (NORTHWEST, NORTHEAST, SOUTHWEST, SOUTHEAST)
+
+
+def square(x: int, y: int) -> int:
+    """Returns the square index of the given coordinates"""
+    return y*8 + x
+
+
+def lsb(bitboard: int) -> int:
+    """Returns the index of the lowest set bit"""
+    return (bitboard & -bitboard).bit_length() - 1
+
+
+def msb(bitboard: int) -> int:
+    """Returns the index of the highest set bit"""
+    return bitboard.bit_length() - 1
+
+
+def squares(bitboard: int) -> list[int]:
+    """Returns the indexes of all the set bits"""
+    result = list()
+    while bitboard:
+        low = bitboard & -bitboard
+        result.append(low.bit_length() - 1)
+        bitboard ^= low
+    return result
+
+
+def coords(bitboard: int) -> list[tuple[int, int]]:
+    """Returns the board coordinates of all the set bits"""
+    return [(sq & 7, sq >> 3) for sq in squares(bitboard)]
+
+
+def _steps(offsets: tuple[tuple[int, int], ...]) -> list[int]:
+    """Builds the jump table for the given offsets"""
+    table = list()
+    for sq in range(64):
+        x, y = sq & 7, sq >> 3
+        mask = 0
+        for dx, dy in offsets:
+            if 0 <= x+dx < 8 and 0 <= y+dy < 8: mask |= 1 << square(x+dx, y+dy)
+        table.append(mask)
+    return table
+
+
+def _ray(sq: int, dx: int, dy: int) -> int:
+    """Builds the mask of a ray without its origin"""
+    x, y = sq & 7, sq >> 3
+    mask = 0
+    x, y = x+dx, y+dy
+    while 0 <= x < 8 and 0 <= y < 8:
+        mask |= 1 << square(x, y)
+        x, y = x+dx, y+dy
+    return mask
+
+
+# JUMP TABLES
+KNIGHT_ATTACKS = _steps(((-1, -2), (1, -2), (-2, -1), (2, -1), (-1, 2), (1, 2), (-2, 1), (2, 1)))
+KING_ATTACKS = _steps(ORTHOGONALS + DIAGONALS)
+PAWN_ATTACKS = (_steps(((-1, -1), (1, -1))), _steps(((-1, 1), (1, 1))))
+
+# RAY TABLES, A RAY IS ASCENDING WHEN ITS SQUARES GROW FROM THE ORIGIN
+RAYS = {direction: [_ray(sq, *direction) for sq in range(64)] for direction in ORTHOGONALS + DIAGONALS}
+ASCENDING = {direction: direction[1] > 0 or (direction[1] == 0 and direction[0] > 0) for direction in RAYS}
+
+
+def _between(start: int, end: int) -> int:
+    """Builds the mask of the squares strictly between two aligned squares"""
+    for rays in RAYS.values():
+        if rays[start] & (1 << end): return rays[start] & ~rays[end] & ~(1 << end)
+    return 0
+
+
+# SQUARES BETWEEN ALIGNED PAIRS, EMPTY WHEN THEY ARE NOT ON THE SAME LINE
+BETWEEN = [[_between(start, end) for end in range(64)] for start in range(64)]
+
+
+def _slides(sq: int, directions: tuple[tuple[int, int], ...]) -> tuple[tuple[int, bool, list[int]], ...]:
+    """Builds the non empty rays of a square as (RAY, ASCENDING, RAYS OF THE DIRECTION)"""
+    return tuple((RAYS[direction][sq], ASCENDING[direction], RAYS[direction]) for direction in directions if RAYS[direction][sq])
+
+
+def _ordered(sq: int, directions: tuple[tuple[int, int], ...]) -> tuple[tuple[int, ...], ...]:
+    """Builds the non empty rays of a square as squares from the origin outwards"""
+    return tuple(RAY_SQUARES[direction][sq] for direction in directions if RAY_SQUARES[direction][sq])
+
+
+# SLIDING TABLES PER SQUARE, BUILT ONCE SO GENERATION NEVER ALLOCATES DIRECTIONS
+ROOK_SLIDES = [_slides(sq, ORTHOGONALS) for sq in range(64)]
+BISHOP_SLIDES = [_slides(sq, DIAGONALS) for sq in range(64)]
+QUEEN_SLIDES = [_slides(sq, ORTHOGONALS + DIAGONALS) for sq in range(64)]
+
+# ORDERED TABLES, JUMP TARGETS AND THE SQUARES OF EACH RAY FROM THE ORIGIN OUTWARDS
+KNIGHT_TARGETS = [tuple(squares(mask)) for mask in KNIGHT_ATTACKS]
+KING_TARGETS = [tuple(squares(mask)) for mask in KING_ATTACKS]
+RAY_SQUARES = {direction: [tuple(sorted(squares(RAYS[direction][sq]), reverse=not ASCENDING[direction])) for sq in range(64)] for direction in RAYS}
+ROOK_RAYS = [_ordered(sq, ORTHOGONALS) for sq in range(64)]
+BISHOP_RAYS = [_ordered(sq, DIAGONALS) for sq in range(64)]
+QUEEN_RAYS = [_ordered(sq, ORTHOGONALS + DIAGONALS) for sq in range(64)]
+
+
+def ray_attacks(occupied: int, slides: tuple[tuple[int, bool, list[int]], ...]) -> int:
+    """Returns the squares reached by sliding until the first blocker"""
+    attacks = 0
+    for ray, ascending, rays in slides:
+        if blockers := ray & occupied:
+            ray ^= rays[(blockers & -blockers).bit_length() - 1 if ascending else blockers.bit_length() - 1]
+        attacks |= ray
+    return attacks
+
+
+def rook_attacks(sq: int, occupied: int) -> int:
+    """Returns the rook attacks from the given square"""
+    return ray_attacks(occupied, ROOK_SLIDES[sq])
+
+
+def bishop_attacks(sq: int, occupied: int) -> int:
+    """Returns the bishop attacks from the given square"""
+    return ray_attacks(occupied, BISHOP_SLIDES[sq])
+
+
+def queen_attacks(sq: int, occupied: int) -> int:
+    """Returns the queen attacks from the given square"""
+    return ray_attacks(occupied, QUEEN_SLIDES[sq])
+
+
+# LINES OF AN EMPTY BOARD, THE PIECES THAT COULD PIN OR CHECK FROM AFAR
+ROOK_LINES = [rook_attacks(sq, 0) for sq in range(64)]
+BISHOP_LINES = [bishop_attacks(sq, 0) for sq in range(64)]
+
+
+class Bitboards:
+    """Keeps a 64 bit mask per team and piece type plus the occupancy"""
+    def __init__(self):
+        self.clear()
+
+    def clear(self) -> None:
+        """Empties every bitboard"""
+        self.pieces = [[0]*6, [0]*6]
+        self.teams = [0, 0]
+        self.occupied = 0
+
+    def put(self, team: int, kind: int, sq: int) -> None:
+        """Places a piece on the given square"""
+        mask = 1 << sq
+        self.pieces[team][kind] |= mask
+        self.teams[team] |= mask
+        self.occupied |= mask
+
+    def remove(self, team: int, kind: int, sq: int) -> None:
+        """Removes a piece from the given square"""
+        mask = ~(1 << sq)
+        self.pieces[team][kind] &= mask
+        self.teams[team] &= mask
+        self.occupied &= mask
+
+    def move(self, team: int, kind: int, start: int, end: int) -> None:
+        """Moves a piece between two squares, the end must be empty"""
+        mask = (1 << start) | (1 << end)
+        self.pieces[team][kind] ^= mask
+        self.teams[team] ^= mask
+        self.occupied ^= mask
+
+    def piece_at(self, sq: int) -> tuple[int, int] | None:
+        """Returns the team and kind of the piece on the given square"""
+        mask = 1 << sq
+        if not self.occupied & mask: return None
+        team = WHITE if self.teams[WHITE] & mask else BLACK
+        for kind, pieces in enumerate(self.pieces[team]):
+            if pieces & mask: return team, kind
+
+    def attackers(self, sq: int, team: int, occupied: int) -> int:
+        """Returns the pieces of the team that attack the given square"""
+        pieces = self.pieces[team]
+        straight = pieces[ROOK] | pieces[QUEEN]
+        diagonal = pieces[BISHOP] | pieces[QUEEN]
+        return (
+            (PAWN_ATTACKS[1-team][sq] & pieces[PAWN])
+            | (KNIGHT_ATTACKS[sq] & pieces[KNIGHT])
+            | (KING_ATTACKS[sq] & pieces[KING])
+            | (rook_attacks(sq, occupied) & straight if straight else 0)
+            | (bishop_attacks(sq, occupied) & diagonal if diagonal else 0)
+        )
+
+    def attacks(self, team: int, occupied: int) -> int:
+        """Returns every square attacked by the team"""
+        pieces = self.pieces[team]
+        attacks = 0
+        for sq in squares(pieces[PAWN]): attacks |= PAWN_ATTACKS[team][sq]
+        for sq in squares(pieces[KNIGHT]): attacks |= KNIGHT_ATTACKS[sq]
+        for sq in squares(pieces[KING]): attacks |= KING_ATTACKS[sq]
+        for sq in squares(pieces[BISHOP] | pieces[QUEEN]): attacks |= bishop_attacks(sq, occupied)
+        for sq in squares(pieces[ROOK] | pieces[QUEEN]): attacks |= rook_attacks(sq, occupied)
+        return attacks
+
+    def pawn_moves(self, team: int, sq: int) -> int:
+        """Returns the pushes and captures of a pawn"""
+        empty = ~self.occupied
+        step = 8 if team == BLACK else -8
+        moves = 0
+        if (front := sq + step) in range(64) and (1 << front) & empty:
+            moves |= 1 << front
+            if (1 << sq) & START_RANKS[team] and (1 << (front + step)) & empty:
+                moves |= 1 << (front + step)
+        return moves | (PAWN_ATTACKS[team][sq] & self.teams[1-team])
+
+    def knight_moves(self, team: int, sq: int) -> int:
+        """Returns the knight moves that do not land on a friendly piece"""
+        return KNIGHT_ATTACKS[sq] & ~self.teams[team]
+
+    def bishop_moves(self, team: int, sq: int) -> int:
+        """Returns the bishop moves that do not land on a friendly piece"""
+        return bishop_attacks(sq, self.occupied) & ~self.teams[team]
+
+    def rook_moves(self, team: int, sq: int) -> int:
+        """Returns the rook moves that do not land on a friendly piece"""
+        return rook_attacks(sq, self.occupied) & ~self.teams[team]
+
+    def queen_moves(self, team: int, sq: int) -> int:
+        """Returns the queen moves that do not land on a friendly piece"""
+        return queen_attacks(sq, self.occupied) & ~self.teams[team]
+
+    def king_moves(self, team: int, sq: int) -> int:
+        """Returns the king steps that do not land on a friendly piece"""
+        return KING_ATTACKS[sq] & ~self.teams[team]
+
+    def __repr__(self) -> str:
+        rows = list()
+        for y in range(8):
+            row = ''
+            for x in range(8):
+                mask = 1 << square(x, y)
+                symbol = '.'
+                for team in (WHITE, BLACK):
+                    for kind in range(6):
+                        if self.pieces[team][kind] & mask:
+                            symbol = 'PNBRQK'[kind] if team == WHITE else 'pnbrqk'[kind]
+                row += symbol
+            rows.append(row)
+        return '\n'.join(rows)
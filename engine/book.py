@@ -0,0 +1,127 @@
+"""Opening book of weighted moves per position key, read with mmap and binary search
+
+    python -m engine.book build games/ -o engine/book.bin     compiles every .pgn of a directory
+    python -m engine.book probe --fen "..."                   shows the book moves of a position
+"""
+
+import os
+import sys
+import mmap
+import random
+import struct
+import argparse
+from collections import Counter
+from engine import moves
+from engine.pgn import read_pgn, parse_san
+from engine.position import Position, START_FEN
+from engine.records import first_record
+
+# FORMAT, A HEADER AND THEN RECORDS SORTED BY KEY
+MAGIC = b'SCBK'
+VERSION = 1
+HEADER = struct.Struct('<4sII')
+RECORD = struct.Struct('<QHH')
+MAX_WEIGHT = 0xFFFF
+
+# DEFAULT PATH NEXT TO THE ENGINE
+BOOK_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'book.bin')
+
+
+class Book:
+    """Sorted (key, move, weight) records of a book file mapped in memory"""
+    def __init__(self, path: str=BOOK_PATH):
+        self.file = open(path, 'rb')
+        self.data = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, self.count = HEADER.unpack_from(self.data, 0)
+        if magic != MAGIC or version != VERSION: raise ValueError(f'{path} is not a book of version {VERSION}')
+
+    def key_at(self, index: int) -> int:
+        """Returns the key of the record at the index"""
+        return RECORD.unpack_from(self.data, HEADER.size + index * RECORD.size)[0]
+
+    def moves(self, key: int) -> list[tuple[int, int]]:
+        """Returns the moves of the position with their weights, heaviest first"""
+        result = list()
+        for index in range(first_record(self.data, HEADER.size, RECORD, self.count, key), self.count):
+            record_key, move, weight = RECORD.unpack_from(self.data, HEADER.size + index * RECORD.size)
+            if record_key != key: break
+            result.append((move, weight))
+        return result
+
+    def best(self, key: int) -> int:
+        """Returns the most played move of the position, 0 if it is not in the book"""
+        book_moves = self.moves(key)
+        return book_moves[0][0] if book_moves else 0
+
+    def pick(self, key: int) -> int:
+        """Returns a move chosen at random by weight, 0 if the position is not in the book"""
+        if not (book_moves := self.moves(key)): return 0
+        return random.choices([move for move, _ in book_moves], [weight for _, weight in book_moves])[0]
+
+    def close(self) -> None:
+        """Unmaps the file"""
+        self.data.close()
+        self.file.close()
+
+    def __len__(self) -> int:
+        return self.count
+
+
+def load(path: str=BOOK_PATH) -> Book | None:
+    """Opens the book if the file exists"""
+    return Book(path) if os.path.exists(path) else None
+
+
+def build(directory: str, path: str=BOOK_PATH, plies: int=24, minimum: int=2) -> int:
+    """Compiles the first plies of every game in the PGN files of the directory, returns the records written"""
+    counts = Counter()
+    for name in sorted(os.listdir(directory)):
+        if not name.lower().endswith('.pgn'): continue
+
+        # A WRONG MOVE ENDS THE GAME, THE MOVES BEFORE IT ARE STILL COUNTED
+        for game in read_pgn(os.path.join(directory, name)):
+            if game.fen != START_FEN: continue
+            position = Position()
+            for san in game.sans[:plies]:
+                try: move = parse_san(position, san)
+                except ValueError: break
+                counts[(position.key, move)] += 1
+                position.make(move)
+
+    records = sorted(
+        ((key, move, min(count, MAX_WEIGHT)) for (key, move), count in counts.items() if count >= minimum),
+        key=lambda record: (record[0], -record[2])
+    )
+    with open(path, 'wb') as f:
+        f.write(HEADER.pack(MAGIC, VERSION, len(records)))
+        for record in records: f.write(RECORD.pack(*record))
+    return len(records)
+
+
+def main(argv: list[str]=None) -> int:
+    """Builds or probes a book, returns the exit code"""
+    parser = argparse.ArgumentParser(prog='python -m engine.book', description='Opening book of Star Chess')
+    commands = parser.add_subparsers(dest='command', required=True)
+    builder = commands.add_parser('build', help='compile a directory of PGN files')
+    builder.add_argument('directory')
+    builder.add_argument('-o', '--output', default=BOOK_PATH)
+    builder.add_argument('-p', '--plies', type=int, default=24, help='plies of each game to keep')
+    builder.add_argument('-m', '--minimum', type=int, default=2, help='games a move needs to enter the book')
+    prober = commands.add_parser('probe', help='show the book moves of a position')
+    prober.add_argument('-f', '--fen', default=START_FEN)
+    prober.add_argument('-b', '--book', default=BOOK_PATH)
+    args = parser.parse_args(argv)
+
+    if args.command == 'build':
+        count = build(args.directory, args.output, args.plies, args.minimum)
+        print(f'{count} moves written to {args.output}')
+        return 0
+
+    book = Book(args.book)
+    for move, weight in book.moves(Position(args.fen).key): print(f'{moves.name(move)} {weight}')
+    book.close()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
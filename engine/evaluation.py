@@ -0,0 +1,43 @@
+"""Static evaluation of a position in centipawns"""
+
+from engine.bitboard import *
+from engine.position import Position, EMPTY
+from engine.tables import MIDDLE_SCORES, END_SCORES, CODE_PHASES, MAX_PHASE
+
+
+def taper(middlegame: int, endgame: int, phase: int) -> int:
+    """Blends the middlegame and endgame scores by the material left"""
+    phase = min(phase, MAX_PHASE)
+    return (middlegame * phase + endgame * (MAX_PHASE - phase)) // MAX_PHASE
+
+
+def evaluate(position: Position) -> int:
+    """Returns the score of the position for the side to move from the totals the position keeps"""
+    score = taper(position.middlegame, position.endgame, position.phase)
+    return score if position.turn == WHITE else -score
+
+
+def evaluate_full(position: Position) -> int:
+    """Returns the same score rescanning every square, to check the running totals"""
+    middlegame = endgame = phase = 0
+    for sq, code in enumerate(position.squares):
+        if code == EMPTY: continue
+        middlegame += MIDDLE_SCORES[code][sq]
+        endgame += END_SCORES[code][sq]
+        phase += CODE_PHASES[code]
+    score = taper(middlegame, endgame, phase)
+    return score if position.turn == WHITE else -score
+
+
+def evaluate_middlegame(position: Position) -> int:
+    """Returns the middlegame score alone for the side to move"""
+    return position.middlegame if position.turn == WHITE else -position.middlegame
+
+
+def evaluate_endgame(position: Position) -> int:
+    """Returns the endgame score alone for the side to move"""
+    return position.endgame if position.turn == WHITE else -position.endgame
+
+
+# EVALUATIONS BY NAME, FOR TOOLS THAT COMPARE THEM
+EVALUATIONS = {'tapered': evaluate, 'middlegame': evaluate_middlegame, 'endgame': evaluate_endgame}
@@ -0,0 +1,127 @@
+"""Legal moves kept per piece and regenerated only where a move changes something"""
+
+from engine import moves
+from engine.bitboard import *
+from engine.legal import Legality
+from engine.position import Position, EMPTY
+
+
+class MoveGenerator:
+    """Pseudo legal moves of every piece with an index of the squares each one observes"""
+    def __init__(self, position: Position, debug: bool=False):
+        self.position = position
+        self.debug = debug
+        self.rebuild()
+
+    def rebuild(self) -> None:
+        """Generates the moves of every piece from scratch"""
+        self.moves: list[list[int]] = [list() for _ in range(64)]
+        self.depends = [0]*64
+        self.observers = [0]*64
+        self.tracked = 0
+        self.regenerated = 0
+        for sq in squares(self.position.bitboards.occupied): self.add(sq)
+
+    def piece_moves(self, sq: int) -> tuple[list[int], int]:
+        """Returns the pseudo legal moves of the piece on the square and the squares they depend on"""
+        codes = self.position.squares
+        code = codes[sq]
+        team, kind = code // 6, code % 6
+        result = list()
+        append = result.append
+
+        # JUMPS DEPEND ON EVERY TARGET
+        if kind == KNIGHT or kind == KING:
+            targets = KNIGHT_TARGETS[sq] if kind == KNIGHT else KING_TARGETS[sq]
+            for end in targets:
+                if codes[end] == EMPTY or codes[end] // 6 != team: append(sq | (end << 6))
+            return result, KNIGHT_ATTACKS[sq] if kind == KNIGHT else KING_ATTACKS[sq]
+
+        # PAWNS DEPEND ON THE SQUARES IN FRONT AND THE DIAGONALS
+        if kind == PAWN:
+            step = -8 if team == WHITE else 8
+            front = sq + step
+            depends = PAWN_ATTACKS[team][sq] | (1 << front)
+            ends = list()
+            if codes[front] == EMPTY:
+                ends.append(front)
+                if (1 << sq) & START_RANKS[team]:
+                    depends |= 1 << (front + step)
+                    if codes[front + step] == EMPTY: ends.append(front + step)
+            for end in squares(PAWN_ATTACKS[team][sq]):
+                if codes[end] != EMPTY and codes[end] // 6 != team: ends.append(end)
+            for end in ends:
+                if (1 << end) & (RANK_8 | RANK_1):
+                    for promotion in (QUEEN, KNIGHT, ROOK, BISHOP): append(moves.encode(sq, end, moves.PROMOTION, promotion))
+                else: append(sq | (end << 6))
+            return result, depends
+
+        # SLIDERS DEPEND ON THEIR RAYS UP TO THE FIRST PIECE
+        depends = 0
+        rays = BISHOP_RAYS if kind == BISHOP else ROOK_RAYS if kind == ROOK else QUEEN_RAYS
+        for ray in rays[sq]:
+            for end in ray:
+                depends |= 1 << end
+                if codes[end] == EMPTY:
+                    append(sq | (end << 6))
+                    continue
+                if codes[end] // 6 != team: append(sq | (end << 6))
+                break
+        return result, depends
+
+    def add(self, sq: int) -> None:
+        """Generates the moves of the piece on the square and indexes what it observes"""
+        self.moves[sq], depends = self.piece_moves(sq)
+        self.depends[sq] = depends
+        self.tracked |= 1 << sq
+        self.regenerated += 1
+        for target in squares(depends): self.observers[target] |= 1 << sq
+
+    def discard(self, sq: int) -> None:
+        """Forgets the moves of the square and removes it from the index"""
+        mask = ~(1 << sq)
+        for target in squares(self.depends[sq]): self.observers[target] &= mask
+        self.moves[sq] = list()
+        self.depends[sq] = 0
+        self.tracked &= mask
+
+    def update(self, changed: int) -> None:
+        """Regenerates the pieces on the changed squares and the pieces that observe them"""
+        dirty = changed
+        for target in squares(changed): dirty |= self.observers[target]
+        for sq in squares(dirty & self.tracked): self.discard(sq)
+        for sq in squares(dirty & self.position.bitboards.occupied): self.add(sq)
+
+    def legal_moves(self) -> list[int]:
+        """Returns every legal move of the side to move, filtering the kept pseudo legal moves"""
+        position = self.position
+        bitboards = position.bitboards
+        team = position.turn
+        legality = Legality(bitboards, team, position.attack_map)
+        evasions, pins = legality.evasions, legality.pins
+        result = list()
+
+        # KING
+        if legality.king >= 0:
+            danger = legality.danger
+            result.extend(move for move in self.moves[legality.king] if not danger >> ((move >> 6) & 63) & 1)
+            position.castling_moves(legality, result.append)
+
+        # ONLY THE KING MOVES IN DOUBLE CHECK, OTHERWISE CHECKS AND PINS LIMIT THE TARGETS
+        if evasions:
+            for sq in squares(bitboards.teams[team] & ~bitboards.pieces[team][KING]):
+                allowed = evasions & pins[sq] if sq in pins else evasions
+                if allowed == FULL: result.extend(self.moves[sq])
+                else: result.extend(move for move in self.moves[sq] if allowed >> ((move >> 6) & 63) & 1)
+            position.passant_moves(legality, result.append)
+
+        if self.debug: self.verify(result)
+        return result
+
+    def verify(self, result: list[int]) -> None:
+        """Compares the moves with a full generation, raises if they differ"""
+        expected = self.position.legal_moves()
+        if sorted(result) == sorted(expected): return
+        missing = ' '.join(moves.name(move) for move in set(expected) - set(result))
+        extra = ' '.join(moves.name(move) for move in set(result) - set(expected))
+        raise RuntimeError(f'incremental moves differ in {self.position.fen()}, missing: {missing or "-"}, extra: {extra or "-"}')
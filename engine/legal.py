@@ -0,0 +1,83 @@
+"""Check and pin aware legality of a position"""
+
+from engine.bitboard import *
+from engine.attacks import AttackMap
+
+
+class Legality:
+    """Checkers, evasion mask and pinned rays of one team, computed once per position"""
+    def __init__(self, bitboards: Bitboards, team: int, attack_map: AttackMap=None):
+
+        # PROPERTIES
+        self.bitboards = bitboards
+        self.team = team
+        self.enemy = 1 - team
+        self.pins: dict[int, int] = dict()
+
+        # A TEAM WITHOUT KING HAS NOTHING TO DEFEND
+        king = bitboards.pieces[team][KING]
+        if not king:
+            self.king = -1
+            self.checkers = 0
+            self.evasions = FULL
+            self.danger = 0
+            return
+
+        # CHECKERS AND THE SQUARES THAT STOP THEM
+        self.king = lsb(king)
+        occupied = bitboards.occupied
+        safe = attack_map and not attack_map.attacked(self.king, self.enemy)
+        self.checkers = 0 if safe else bitboards.attackers(self.king, self.enemy, occupied)
+        if not self.checkers: self.evasions = FULL
+        elif self.checkers & (self.checkers - 1): self.evasions = 0
+        else: self.evasions = self.checkers | BETWEEN[self.king][lsb(self.checkers)]
+
+        # SQUARES THE KING CAN NOT STEP ON, THE KING ONLY BLOCKS THE RAYS THAT CHECK IT
+        if safe: self.danger = attack_map.masks[self.enemy]
+        else: self.danger = bitboards.attacks(self.enemy, occupied & ~king)
+
+        # PINNED PIECES ONLY MOVE ALONG THE RAY OF THEIR PINNER
+        enemy = bitboards.pieces[self.enemy]
+        snipers = (
+            (ROOK_LINES[self.king] & (enemy[ROOK] | enemy[QUEEN]))
+            | (BISHOP_LINES[self.king] & (enemy[BISHOP] | enemy[QUEEN]))
+        )
+        for sniper in squares(snipers):
+            between = BETWEEN[self.king][sniper]
+            blockers = between & occupied
+            if not blockers or blockers & (blockers - 1): continue
+            if blockers & bitboards.teams[team]: self.pins[lsb(blockers)] = between | (1 << sniper)
+
+    @property
+    def in_check(self) -> bool:
+        """Returns if the king is attacked"""
+        return bool(self.checkers)
+
+    def allowed(self, kind: int, sq: int) -> int:
+        """Returns the mask of destinations that keep the king safe"""
+        if kind == KING: return ~self.danger & FULL
+        return self.evasions & self.pins.get(sq, FULL)
+
+    def is_legal(self, kind: int, start: int, end: int) -> bool:
+        """Checks if a regular move keeps the king safe"""
+        return bool(self.allowed(kind, start) & (1 << end))
+
+    def en_passant(self, start: int, end: int, captured: int) -> bool:
+        """Checks if an en passant capture keeps the king safe"""
+        if self.king < 0: return True
+        bitboards = self.bitboards
+        occupied = (bitboards.occupied & ~(1 << start) & ~(1 << captured)) | (1 << end)
+        enemy = bitboards.pieces[self.enemy]
+        straight = enemy[ROOK] | enemy[QUEEN]
+        diagonal = enemy[BISHOP] | enemy[QUEEN]
+        pawns = enemy[PAWN] & ~(1 << captured)
+        return not (
+            (PAWN_ATTACKS[self.team][self.king] & pawns)
+            or (KNIGHT_ATTACKS[self.king] & enemy[KNIGHT])
+            or (rook_attacks(self.king, occupied) & straight)
+            or (bishop_attacks(self.king, occupied) & diagonal)
+        )
+
+    def castling(self, path: int) -> bool:
+        """Checks if the king can castle crossing the given squares"""
+        return not self.checkers and not (path & self.danger)
@@ -0,0 +1,47 @@
+"""Compact 16 bit move encoding shared by the board and the engine"""
+
+from engine.bitboard import KNIGHT, BISHOP, ROOK, QUEEN
+
+# FLAGS
+NORMAL, PROMOTION, EN_PASSANT, CASTLING = range(4)
+
+# NAMES
+FILES = 'abcdefgh'
+PROMOTIONS = {KNIGHT: 'n', BISHOP: 'b', ROOK: 'r', QUEEN: 'q'}
+
+
+def encode(start: int, end: int, flag: int=NORMAL, promotion: int=KNIGHT) -> int:
+    """Packs a move as start | end << 6 | flag << 12 | promotion << 14"""
+    return start | (end << 6) | (flag << 12) | ((promotion - KNIGHT) << 14)
+
+
+def start(move: int) -> int:
+    """Returns the square the move leaves"""
+    return move & 63
+
+
+def end(move: int) -> int:
+    """Returns the square the move reaches"""
+    return (move >> 6) & 63
+
+
+def flag(move: int) -> int:
+    """Returns the special flag of the move"""
+    return (move >> 12) & 3
+
+
+def promotion(move: int) -> int:
+    """Returns the piece type a pawn becomes, only meaningful with the PROMOTION flag"""
+    return (move >> 14) + KNIGHT
+
+
+def square_name(sq: int) -> str:
+    """Returns the algebraic name of a square, y=0 is the eighth rank"""
+    return f'{FILES[sq & 7]}{8 - (sq >> 3)}'
+
+
+def name(move: int) -> str:
+    """Returns the move in coordinate notation like e2e4 or a7a8q"""
+    text = square_name(start(move)) + square_name(end(move))
+    if flag(move) == PROMOTION: text += PROMOTIONS[promotion(move)]
+    return text
@@ -0,0 +1,131 @@
+"""Perft node counts and speed of the rules engine
+
+    python -m engine.perft                        runs the suite against the baseline
+    python -m engine.perft -p kiwipete -d 4 -v    shows the nodes under each root move
+    python -m engine.perft --fen "..." -d 3       counts any position
+    python -m engine.perft -w 8                   splits the root moves across 8 processes
+    python -m engine.perft --save                 stores the current speed as the baseline
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+from engine import moves
+from engine.position import Position, START_FEN
+
+# STANDARD POSITIONS AS (FEN, NODES PER DEPTH, SUITE DEPTH)
+POSITIONS = {
+    'start': (START_FEN, [20, 400, 8902, 197281, 4865609], 4),
+    'kiwipete': ('r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1', [48, 2039, 97862, 4085603], 3),
+    'passant': ('8/2p5/3p4/KP5r/1R3p1k/8/4P1P1/8 w - - 0 1', [14, 191, 2812, 43238, 674624], 4),
+    'promotion': ('n1n5/PPPk4/8/8/8/8/4Kppp/5N1N b - - 0 1', [24, 496, 9483, 182838, 3605103], 4),
+    'castling': ('r3k2r/Pppp1ppp/1b3nbN/nP6/BBP1P3/q4N2/Pp1P2PP/R2Q1RK1 w kq - 0 1', [6, 264, 9467, 422333], 4),
+}
+
+# BASELINE
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'perft.json')
+TOLERANCE = 0.25
+
+
+def perft(position: Position, depth: int) -> int:
+    """Counts the leaf nodes of the legal move tree"""
+    legal_moves = position.legal_moves()
+    if depth <= 1: return len(legal_moves) if depth == 1 else 1
+    nodes = 0
+    for move in legal_moves:
+        position.make(move)
+        nodes += perft(position, depth-1)
+        position.unmake()
+    return nodes
+
+
+def count_move(fen: str, move: int, depth: int) -> tuple[int, int]:
+    """Counts the nodes under a root move, runs inside the worker processes"""
+    position = Position(fen)
+    position.make(move)
+    return move, perft(position, depth-1)
+
+
+def divide(fen: str, depth: int, workers: int=1) -> dict[int, int]:
+    """Returns the nodes under each root move, optionally split across processes"""
+    position = Position(fen)
+    root_moves = position.legal_moves()
+    if workers <= 1: return dict(count_move(fen, move, depth) for move in root_moves)
+    with ProcessPoolExecutor(workers) as pool:
+        return dict(pool.map(count_move, [fen]*len(root_moves), root_moves, [depth]*len(root_moves)))
+
+
+def load_baseline() -> dict:
+    """Loads the stored speed of each position"""
+    if not os.path.exists(BASELINE_PATH): return dict()
+    with open(BASELINE_PATH, 'r') as f:
+        return json.load(f)
+
+
+def save_baseline(baseline: dict) -> None:
+    """Stores the speed of each position"""
+    with open(BASELINE_PATH, 'w') as f:
+        json.dump(baseline, f, indent=4)
+
+
+def run(name: str, fen: str, depth: int, workers: int, verbose: bool) -> tuple[int, float]:
+    """Counts one position and prints its report, returns the nodes and nodes/sec"""
+    start = time.perf_counter()
+    if verbose or workers > 1:
+        counts = divide(fen, depth, workers)
+        nodes = sum(counts.values())
+    else: nodes = perft(Position(fen), depth)
+    seconds = time.perf_counter() - start
+    speed = nodes / seconds if seconds else 0
+
+    if verbose:
+        for move, count in sorted(counts.items(), key=lambda item: moves.name(item[0])):
+            print(f'  {moves.name(move)}: {count}')
+    print(f'{name} depth {depth}: {nodes} nodes in {seconds:.2f}s ({speed:,.0f} nodes/s)')
+    return nodes, speed
+
+
+def main(argv: list[str]=None) -> int:
+    """Runs the suite or a single position, returns the exit code"""
+    parser = argparse.ArgumentParser(prog='python -m engine.perft', description='Perft of the Star Chess rules')
+    parser.add_argument('-p', '--position', choices=POSITIONS, action='append', help='standard position, all by default')
+    parser.add_argument('-f', '--fen', help='count a custom position instead')
+    parser.add_argument('-d', '--depth', type=int, help='depth, the suite depth by default')
+    parser.add_argument('-w', '--workers', type=int, default=1, help='processes sharing the root moves')
+    parser.add_argument('-v', '--divide', action='store_true', help='show the nodes under each root move')
+    parser.add_argument('--save', action='store_true', help='store the speed as the new baseline')
+    args = parser.parse_args(argv)
+
+    # CUSTOM POSITION HAS NOTHING TO COMPARE WITH
+    if args.fen:
+        run('fen', args.fen, args.depth or 3, args.workers, args.divide)
+        return 0
+
+    baseline = load_baseline()
+    failed = False
+    for name in args.position or POSITIONS:
+        fen, expected, suite_depth = POSITIONS[name]
+        depth = args.depth or suite_depth
+        nodes, speed = run(name, fen, depth, args.workers, args.divide)
+
+        # WRONG COUNTS ARE BUGS IN THE RULES
+        if depth <= len(expected) and nodes != expected[depth-1]:
+            print(f'  wrong node count, expected {expected[depth-1]}')
+            failed = True
+
+        # SLOWDOWNS ARE ONLY COMPARED FOR THE SAME DEPTH AND WORKERS
+        entry = f'{name}/{depth}/{args.workers}'
+        if args.save: baseline[entry] = round(speed)
+        elif entry in baseline and speed < baseline[entry] * (1 - TOLERANCE):
+            print(f'  slower than the baseline of {baseline[entry]:,} nodes/s')
+            failed = True
+
+    if args.save: save_baseline(baseline)
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,287 @@
+"""Streaming PGN games with the rules of the engine, read line by line and written move by move
+
+    python -m engine.pgn games.pgn     replays every game and reports the games per minute
+"""
+
+import re
+import sys
+import time
+import argparse
+from datetime import date
+from engine import moves
+from engine.bitboard import *
+from engine.position import Position, EMPTY, START_FEN
+
+# TOKENS
+RESULTS = ('1-0', '0-1', '1/2-1/2', '*')
+PIECE_LETTERS = 'PNBRQK'
+COMMENTS = re.compile(r'\{[^}]*\}|;[^\n]*|\$\d+')
+MOVE_NUMBER = re.compile(r'^\d+\.+')
+TAG = re.compile(r'\[\s*(\w+)\s+"((?:[^"\\]|\\.)*)"\s*\]')
+ESCAPED = re.compile(r'\\(.)')
+
+# WRITING, THE SEVEN TAGS EVERY GAME HAS AND THE WIDTH OF THE MOVE TEXT
+ROSTER = ('Event', 'Site', 'Date', 'Round', 'White', 'Black', 'Result')
+LINE_WIDTH = 80
+
+
+def pseudo_moves(position: Position, kind: int, end: int, promotion: int) -> list[int]:
+    """Returns the moves of the pieces of a kind that reach the square, legal or not"""
+    team = position.turn
+    own = position.bitboards.pieces[team][kind]
+    occupied = position.bitboards.occupied
+    target = position.squares[end]
+    if target != EMPTY and target // 6 == team: return list()
+
+    # SLIDERS SEE THE SQUARE FROM THE SAME RAYS IT SEES THEM
+    if kind == KNIGHT: starts = KNIGHT_ATTACKS[end] & own
+    elif kind == BISHOP: starts = bishop_attacks(end, occupied) & own
+    elif kind == ROOK: starts = rook_attacks(end, occupied) & own
+    elif kind == QUEEN: starts = queen_attacks(end, occupied) & own
+    elif kind == KING: starts = KING_ATTACKS[end] & own
+    else: return pawn_moves(position, end, promotion)
+    return [moves.encode(start, end) for start in squares(starts)]
+
+
+def pawn_moves(position: Position, end: int, promotion: int) -> list[int]:
+    """Returns the pushes and captures of the pawns that reach the square, legal or not"""
+    team = position.turn
+    pawns = position.bitboards.pieces[team][PAWN]
+    forward = -8 if team == WHITE else 8
+    flag, piece = (moves.PROMOTION, promotion) if end >> 3 in (0, 7) else (moves.NORMAL, KNIGHT)
+
+    starts = list()
+    if position.squares[end] != EMPTY: starts += [(start, flag) for start in squares(PAWN_ATTACKS[1-team][end] & pawns)]
+    else:
+        if end == position.passant: starts += [(start, moves.EN_PASSANT) for start in squares(PAWN_ATTACKS[1-team][end] & pawns)]
+        # NO PAWN COMES FROM BEHIND ITS OWN BACK RANK
+        single = end - forward
+        if not 0 <= single < 64: return []
+        if pawns >> single & 1: starts.append((single, flag))
+        elif position.squares[single] == EMPTY and 0 <= (double := single - forward) < 64 and START_RANKS[team] >> double & 1 and pawns >> double & 1:
+            starts.append((double, flag))
+    return [moves.encode(start, end, flag, piece) for start, flag in starts]
+
+
+def legal(position: Position, move: int) -> bool:
+    """Checks that the move does not leave the own king attacked"""
+    position.make(move)
+    attacked = position.in_check(1 - position.turn)
+    position.unmake()
+    return not attacked
+
+
+def parse_san(position: Position, san: str, legal_moves: list[int]=None) -> int:
+    """Returns the legal move written in standard algebraic notation, raises ValueError if there is none, without legal moves only the pieces reaching the target are tried"""
+    text = san.rstrip('+#!?')
+    if not text: raise ValueError(f'invalid move {san}')
+
+    # CASTLING, THE LONG ONE HAS TWO DASHES
+    if text.replace('0', 'O') in ('O-O', 'O-O-O'):
+        left = text.count('-') == 2
+        for move in legal_moves or position.legal_moves():
+            if moves.flag(move) == moves.CASTLING and (moves.end(move) & 7 == 2) == left: return move
+        raise ValueError(f'illegal castling {san}')
+
+    # PROMOTION, WITH OR WITHOUT THE EQUALS SIGN
+    promotion = None
+    if '=' in text: text, letter = text.split('=')
+    elif text[-1] in 'NBRQ' and text[0] in moves.FILES: text, letter = text[:-1], text[-1]
+    else: letter = ''
+    if letter: promotion = PIECE_LETTERS.index(letter.upper())
+    if not text: raise ValueError(f'invalid move {san}')
+
+    # PIECE, DISAMBIGUATION AND TARGET
+    kind = PIECE_LETTERS.index(text[0]) if text[0] in 'NBRQK' else PAWN
+    body = (text[1:] if kind != PAWN else text).replace('x', '')
+    if len(body) < 2 or body[-2] not in moves.FILES or body[-1] not in '12345678': raise ValueError(f'invalid move {san}')
+    end = square(moves.FILES.index(body[-2]), 8 - int(body[-1]))
+    hints = body[:-2]
+
+    candidates = pseudo_moves(position, kind, end, promotion or QUEEN) if legal_moves is None else legal_moves
+    found = list()
+    for move in candidates:
+        start = moves.start(move)
+        if moves.end(move) != end or position.squares[start] % 6 != kind: continue
+        if any(start & 7 != moves.FILES.index(hint) if hint in moves.FILES else 8 - (start >> 3) != int(hint) for hint in hints): continue
+        if moves.flag(move) == moves.PROMOTION and moves.promotion(move) != (promotion or QUEEN): continue
+        found.append(move)
+    if legal_moves is None: found = [move for move in found if legal(position, move)]
+    if len(found) != 1: raise ValueError(f'{"ambiguous" if found else "illegal"} move {san}')
+    return found[0]
+
+
+def to_san(position: Position, move: int, legal_moves: list[int]) -> str:
+    """Returns the legal move in standard algebraic notation, with + or # if it checks"""
+    start, end, flag = moves.start(move), moves.end(move), moves.flag(move)
+    kind = position.squares[start] % 6
+    capture = 'x' if position.squares[end] != EMPTY or flag == moves.EN_PASSANT else ''
+
+    if flag == moves.CASTLING: text = 'O-O-O' if end & 7 == 2 else 'O-O'
+    elif kind == PAWN:
+        text = (moves.FILES[start & 7] if capture else '') + capture + moves.square_name(end)
+        if flag == moves.PROMOTION: text += '=' + PIECE_LETTERS[moves.promotion(move)]
+    else:
+        # ONLY THE FILE OR RANK THAT TELLS THE PIECE APART FROM THE OTHERS REACHING THE SAME SQUARE
+        rivals = [moves.start(other) for other in legal_moves if moves.end(other) == end and moves.start(other) != start and position.squares[moves.start(other)] % 6 == kind]
+        hint = ''
+        if rivals:
+            if all(rival & 7 != start & 7 for rival in rivals): hint = moves.FILES[start & 7]
+            elif all(rival >> 3 != start >> 3 for rival in rivals): hint = str(8 - (start >> 3))
+            else: hint = moves.square_name(start)
+        text = PIECE_LETTERS[kind] + hint + capture + moves.square_name(end)
+
+    # A CHECK WITHOUT REPLIES ENDS THE GAME
+    position.make(move)
+    if position.in_check(): text += '+' if position.legal_moves() else '#'
+    position.unmake()
+    return text
+
+
+class Game:
+    """Tags, SAN moves and result of one PGN game"""
+    def __init__(self, headers: dict[str, str]=None, sans: list[str]=None, result: str='*'):
+        self.headers = headers or dict()
+        self.sans = sans or list()
+        self.result = result
+
+    @property
+    def fen(self) -> str:
+        """Returns the position the game starts from"""
+        return self.headers.get('FEN', START_FEN)
+
+    def moves(self) -> list[int]:
+        """Returns the moves of the game replayed from its start, raises ValueError on a wrong move or starting position"""
+        try: position = Position(self.fen)
+        except IndexError as error: raise ValueError(f'invalid FEN {self.fen}') from error
+        game_moves = list()
+        for san in self.sans:
+            game_moves.append(move := parse_san(position, san))
+            position.make(move)
+        return game_moves
+
+    def __repr__(self) -> str:
+        return f'{self.headers.get("White", "?")} - {self.headers.get("Black", "?")} {self.result}, {len(self.sans)} plies'
+
+
+# READING
+def iter_games(lines):
+    """Yields every game of an iterable of PGN lines, keeping only one game in memory"""
+    game, depth, in_comment = Game(), 0, False
+    for line in lines:
+
+        # A BRACE COMMENT GOES ON UNTIL ITS CLOSING BRACE, WHATEVER THE LINES BETWEEN
+        if in_comment:
+            if (close := line.find('}')) < 0: continue
+            line, in_comment = line[close+1:], False
+        elif line.startswith('%'): continue
+
+        # TAGS, A TAG AFTER MOVES WITHOUT RESULT STARTS THE NEXT GAME
+        if line.lstrip().startswith('[') and not depth:
+            if game.sans:
+                yield game
+                game = Game()
+            for key, value in TAG.findall(line): game.headers[key] = ESCAPED.sub(r'\1', value)
+            continue
+
+        line = COMMENTS.sub(' ', line)
+        if (opening := line.find('{')) >= 0: line, in_comment = line[:opening], True
+        for token in line.replace('(', ' ( ').replace(')', ' ) ').split():
+            if token == '(': depth += 1
+            elif token == ')': depth -= 1
+            elif depth: continue
+            elif token in RESULTS:
+                game.result = token
+                yield game
+                game = Game()
+            elif token := MOVE_NUMBER.sub('', token): game.sans.append(token)
+    if game.sans: yield game
+
+
+def read_pgn(path: str):
+    """Yields every game of a PGN file without loading the whole file"""
+    with open(path, 'r', encoding='utf-8', errors='replace') as f:
+        yield from iter_games(f)
+
+
+def read_games(text: str) -> list[list[str]]:
+    """Returns the SAN moves of every game in a PGN text, ignoring tags, comments and variations"""
+    return [game.sans for game in iter_games(text.splitlines())]
+
+
+# WRITING
+def escape(value: object) -> str:
+    """Returns a tag value with its backslashes and quotes escaped"""
+    return str(value).replace('\\', '\\\\').replace('"', '\\"')
+
+
+def format_game(game_moves: list[int], result: str, headers: dict[str, str]=None, fen: str=START_FEN) -> str:
+    """Returns the PGN text of a game, the roster tags first and the moves wrapped to the line width"""
+    headers = {'Event': '?', 'Site': '?', 'Date': date.today().strftime('%Y.%m.%d'), 'Round': '-', 'White': '?', 'Black': '?', **(headers or dict())}
+    headers['Result'] = result
+    if fen != START_FEN: headers.update(SetUp='1', FEN=fen)
+    tags = list(ROSTER) + [key for key in headers if key not in ROSTER]
+    text = ''.join(f'[{key} "{escape(headers[key])}"]\n' for key in tags)
+
+    # MOVE TEXT, BLACK TO MOVE FIRST STARTS WITH THE ELLIPSIS
+    position = Position(fen)
+    tokens = list()
+    for move in game_moves:
+        if position.turn == WHITE: tokens.append(f'{position.fullmove}.')
+        elif not tokens: tokens.append(f'{position.fullmove}...')
+        tokens.append(to_san(position, move, position.legal_moves()))
+        position.make(move)
+    tokens.append(result)
+
+    lines, line = list(), ''
+    for token in tokens:
+        if line and len(line) + len(token) + 1 > LINE_WIDTH:
+            lines.append(line)
+            line = token
+        else: line = f'{line} {token}' if line else token
+    lines.append(line)
+    return text + '\n' + '\n'.join(lines) + '\n\n'
+
+
+class PGNWriter:
+    """Appends games to a PGN file, creating it if needed"""
+    def __init__(self, path: str):
+        self.file = open(path, 'a', encoding='utf-8')
+
+    def write(self, game_moves: list[int], result: str, headers: dict[str, str]=None, fen: str=START_FEN) -> None:
+        """Appends one game"""
+        self.file.write(format_game(game_moves, result, headers, fen))
+
+    def close(self) -> None:
+        """Flushes and closes the file"""
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+
+def main(argv: list[str]=None) -> int:
+    """Replays the games of a PGN file and reports the speed, returns the exit code"""
+    parser = argparse.ArgumentParser(prog='python -m engine.pgn', description='Streaming PGN reader of Star Chess')
+    parser.add_argument('path')
+    parser.add_argument('--report', type=int, default=10000, help='games between progress lines')
+    args = parser.parse_args(argv)
+
+    games = plies = errors = 0
+    start = time.perf_counter()
+    for game in read_pgn(args.path):
+        games += 1
+        try: plies += len(game.moves())
+        except ValueError: errors += 1
+        if games % args.report == 0: print(f'{games} games, {games / (time.perf_counter() - start) * 60:,.0f} games/min')
+
+    seconds = time.perf_counter() - start
+    print(f'{games} games, {plies} plies, {errors} with wrong moves in {seconds:.1f}s, {games / seconds * 60:,.0f} games/min')
+    return 0 if not errors else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
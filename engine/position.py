@@ -0,0 +1,333 @@
+"""Pure python position with legal move generation, no pygame needed"""
+
+from engine import moves
+from engine import zobrist
+from engine.bitboard import *
+from engine.legal import Legality
+from engine.tables import MIDDLE_SCORES, END_SCORES, CODE_PHASES
+
+# PIECE CODES IN THE MAILBOX ARE TEAM*6 + KIND, EMPTY SQUARES ARE -1
+EMPTY = -1
+SYMBOLS = 'PNBRQKpnbrqk'
+
+# FILES
+FILE_A = 0x0101010101010101
+FILE_H = FILE_A << 7
+
+# CASTLING AS (RIGHT, KING START, KING END, ROOK START, ROOK END, EMPTY SQUARES, KING PATH)
+CASTLES = (
+    (zobrist.WHITE_RIGHT, 60, 62, 63, 61, (1 << 61) | (1 << 62), (1 << 61) | (1 << 62)),
+    (zobrist.WHITE_LEFT, 60, 58, 56, 59, (1 << 57) | (1 << 58) | (1 << 59), (1 << 58) | (1 << 59)),
+    (zobrist.BLACK_RIGHT, 4, 6, 7, 5, (1 << 5) | (1 << 6), (1 << 5) | (1 << 6)),
+    (zobrist.BLACK_LEFT, 4, 2, 0, 3, (1 << 1) | (1 << 2) | (1 << 3), (1 << 2) | (1 << 3)),
+)
+ROOK_CASTLING = {castle[2]: (castle[3], castle[4]) for castle in CASTLES}
+
+# RIGHTS KEPT WHEN A PIECE LEAVES OR REACHES EACH SQUARE
+KEEP_RIGHTS = [15] * 64
+KEEP_RIGHTS[60] &= ~(zobrist.WHITE_RIGHT | zobrist.WHITE_LEFT)
+KEEP_RIGHTS[63] &= ~zobrist.WHITE_RIGHT
+KEEP_RIGHTS[56] &= ~zobrist.WHITE_LEFT
+KEEP_RIGHTS[4] &= ~(zobrist.BLACK_RIGHT | zobrist.BLACK_LEFT)
+KEEP_RIGHTS[7] &= ~zobrist.BLACK_RIGHT
+KEEP_RIGHTS[0] &= ~zobrist.BLACK_LEFT
+
+START_FEN = 'rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1'
+
+
+class Position:
+    """Board state, legal moves and reversible make/unmake of a game"""
+    def __init__(self, fen: str=START_FEN):
+        self.set_fen(fen)
+
+    # SETUP
+    def clear(self) -> None:
+        """Empties the position"""
+        self.bitboards = Bitboards()
+        self.squares = [EMPTY] * 64
+        self.turn = WHITE
+        self.castling = 0
+        self.passant = -1
+        self.halfmove = 0
+        self.fullmove = 1
+        self.history = list()
+        self.key = 0
+
+        # MATERIAL AND PIECE SQUARE TOTALS FOR WHITE AND THE PHASE, KEPT BY THE PIECE PRIMITIVES
+        self.middlegame = 0
+        self.endgame = 0
+        self.phase = 0
+
+        # OPTIONAL ATTACK MAP OF THE BITBOARDS, KEPT UP TO DATE BY ITS OWNER
+        self.attack_map = None
+
+    def set_fen(self, fen: str) -> None:
+        """Sets up the position described by a FEN string"""
+        self.clear()
+        fields = fen.split()
+        placement, turn = fields[0], fields[1]
+        castling = fields[2] if len(fields) > 2 else '-'
+        passant = fields[3] if len(fields) > 3 else '-'
+
+        # PIECES, THE FIRST ROW OF THE FEN IS Y=0
+        for y, row in enumerate(placement.split('/')):
+            x = 0
+            for char in row:
+                if char.isdigit(): x += int(char)
+                else:
+                    code = SYMBOLS.index(char)
+                    self.put(code // 6, code % 6, square(x, y))
+                    x += 1
+
+        # STATE
+        self.turn = WHITE if turn == 'w' else BLACK
+        for char, right in zip('KQkq', (zobrist.WHITE_RIGHT, zobrist.WHITE_LEFT, zobrist.BLACK_RIGHT, zobrist.BLACK_LEFT)):
+            if char in castling: self.castling |= right
+        if passant != '-': self.passant = square(moves.FILES.index(passant[0]), 8 - int(passant[1]))
+        if len(fields) > 4: self.halfmove = int(fields[4])
+        if len(fields) > 5: self.fullmove = int(fields[5])
+        self.key = self.compute_key()
+
+    def fen(self) -> str:
+        """Returns the FEN string of the position"""
+        rows = list()
+        for y in range(8):
+            row, empty = '', 0
+            for x in range(8):
+                code = self.squares[square(x, y)]
+                if code == EMPTY:
+                    empty += 1
+                    continue
+                if empty: row += str(empty)
+                row += SYMBOLS[code]
+                empty = 0
+            if empty: row += str(empty)
+            rows.append(row)
+
+        castling = ''.join(char for char, right in zip('KQkq', (1, 2, 4, 8)) if self.castling & right) or '-'
+        passant = moves.square_name(self.passant) if self.passant >= 0 else '-'
+        turn = 'w' if self.turn == WHITE else 'b'
+        return f'{"/".join(rows)} {turn} {castling} {passant} {self.halfmove} {self.fullmove}'
+
+    def put(self, team: int, kind: int, sq: int) -> None:
+        """Places a piece on an empty square"""
+        code = team*6 + kind
+        self.bitboards.put(team, kind, sq)
+        self.squares[sq] = code
+        self.key ^= zobrist.PIECES[team][kind][sq]
+        self.middlegame += MIDDLE_SCORES[code][sq]
+        self.endgame += END_SCORES[code][sq]
+        self.phase += CODE_PHASES[code]
+
+    def remove(self, sq: int) -> int:
+        """Removes the piece on the square and returns its code"""
+        code = self.squares[sq]
+        team, kind = code // 6, code % 6
+        self.bitboards.remove(team, kind, sq)
+        self.squares[sq] = EMPTY
+        self.key ^= zobrist.PIECES[team][kind][sq]
+        self.middlegame -= MIDDLE_SCORES[code][sq]
+        self.endgame -= END_SCORES[code][sq]
+        self.phase -= CODE_PHASES[code]
+        return code
+
+    def relocate(self, start: int, end: int) -> None:
+        """Moves a piece to an empty square"""
+        code = self.squares[start]
+        team, kind = code // 6, code % 6
+        self.bitboards.move(team, kind, start, end)
+        self.squares[start], self.squares[end] = EMPTY, code
+        keys = zobrist.PIECES[team][kind]
+        self.key ^= keys[start] ^ keys[end]
+        middlegame, endgame = MIDDLE_SCORES[code], END_SCORES[code]
+        self.middlegame += middlegame[end] - middlegame[start]
+        self.endgame += endgame[end] - endgame[start]
+
+    # HASHING
+    def passant_key(self) -> int:
+        """Returns the en passant part of the key, only if a pawn can take"""
+        if self.passant < 0: return 0
+        pawns = self.bitboards.pieces[self.turn][PAWN]
+        if PAWN_ATTACKS[1-self.turn][self.passant] & pawns: return zobrist.EN_PASSANT[self.passant & 7]
+        return 0
+
+    def compute_key(self) -> int:
+        """Hashes the position from scratch"""
+        key = zobrist.CASTLING[self.castling] ^ self.passant_key()
+        if self.turn == BLACK: key ^= zobrist.SIDE
+        for sq, code in enumerate(self.squares):
+            if code != EMPTY: key ^= zobrist.PIECES[code // 6][code % 6][sq]
+        return key
+
+    # QUERIES
+    def king(self, team: int) -> int:
+        """Returns the square of the king of the team, -1 without king"""
+        return lsb(self.bitboards.pieces[team][KING])
+
+    def in_check(self, team: int=None) -> bool:
+        """Checks if the king of the team, by default the side to move, is attacked"""
+        if team is None: team = self.turn
+        if (king := self.king(team)) < 0: return False
+        return bool(self.bitboards.attackers(king, 1-team, self.bitboards.occupied))
+
+    def piece_at(self, sq: int) -> tuple[int, int] | None:
+        """Returns the team and kind of the piece on the square"""
+        code = self.squares[sq]
+        return None if code == EMPTY else (code // 6, code % 6)
+
+    def winner(self, legal_moves: list[int]=None) -> int | None:
+        """Returns the team that won, the side to move loses without king or without moves"""
+        if legal_moves is None: legal_moves = self.legal_moves()
+        if self.king(self.turn) < 0 or not legal_moves: return 1-self.turn
+        return None
+
+    # MOVE GENERATION
+    def legal_moves(self) -> list[int]:
+        """Returns every legal move of the side to move"""
+        team = self.turn
+        bitboards = self.bitboards
+        legality = Legality(bitboards, team, self.attack_map)
+        pieces = bitboards.pieces[team]
+        own = bitboards.teams[team]
+        enemy = bitboards.teams[1-team]
+        occupied = bitboards.occupied
+        evasions, pins = legality.evasions, legality.pins
+        result = list()
+        append = result.append
+
+        # KING
+        if legality.king >= 0:
+            king = legality.king
+            targets = ~own & ~legality.danger
+            for end in KING_TARGETS[king]:
+                if targets >> end & 1: append(king | (end << 6))
+            self.castling_moves(legality, append)
+
+        # ONLY THE KING MOVES IN DOUBLE CHECK
+        if not evasions: return result
+
+        # KNIGHTS, A PINNED KNIGHT NEVER MOVES
+        targets = ~own & evasions
+        for start in squares(pieces[KNIGHT]):
+            if start in pins: continue
+            for end in KNIGHT_TARGETS[start]:
+                if targets >> end & 1: append(start | (end << 6))
+
+        # SLIDERS WALK THEIR ORDERED RAYS UNTIL THE FIRST PIECE
+        codes = self.squares
+        for kind, rays in ((BISHOP, BISHOP_RAYS), (ROOK, ROOK_RAYS), (QUEEN, QUEEN_RAYS)):
+            for start in squares(pieces[kind]):
+                allowed = evasions & pins[start] if start in pins else evasions
+                for ray in rays[start]:
+                    for end in ray:
+                        code = codes[end]
+                        if code == EMPTY:
+                            if allowed >> end & 1: append(start | (end << 6))
+                            continue
+                        if code // 6 != team and allowed >> end & 1: append(start | (end << 6))
+                        break
+
+        # PAWNS
+        self.pawn_moves(team, pieces[PAWN], enemy, occupied, evasions, pins, append)
+        self.passant_moves(legality, append)
+        return result
+
+    def castling_moves(self, legality: Legality, append) -> None:
+        """Adds the castlings of the side to move, never out of or through check"""
+        if not self.castling or legality.checkers: return
+        for right, start, end, rook, _, empty, path in CASTLES:
+            if not self.castling & right or start != legality.king: continue
+            if self.bitboards.occupied & empty or path & legality.danger: continue
+            append(moves.encode(start, end, moves.CASTLING))
+
+    def passant_moves(self, legality: Legality, append) -> None:
+        """Adds the en passant captures of the side to move, the captured pawn is behind the target"""
+        if self.passant < 0: return
+        team = self.turn
+        captured = self.passant + (8 if team == WHITE else -8)
+        for start in squares(PAWN_ATTACKS[1-team][self.passant] & self.bitboards.pieces[team][PAWN]):
+            if legality.en_passant(start, self.passant, captured):
+                append(moves.encode(start, self.passant, moves.EN_PASSANT))
+
+    def pawn_moves(self, team: int, pawns: int, enemy: int, occupied: int, evasions: int, pins: dict, append) -> None:
+        """Adds the pushes, captures and promotions of the pawns"""
+        empty = ~occupied & FULL
+        if team == WHITE:
+            single = (pawns >> 8) & empty
+            double = ((single & (0xFF << 40)) >> 8) & empty
+            left = ((pawns & ~FILE_A) >> 9) & enemy
+            right = ((pawns & ~FILE_H) >> 7) & enemy
+            steps = ((single, 8), (double, 16), (left, 9), (right, 7))
+            last_rank = RANK_8
+        else:
+            single = (pawns << 8) & empty
+            double = ((single & (0xFF << 16)) << 8) & empty
+            left = ((pawns & ~FILE_A) << 7) & enemy & FULL
+            right = ((pawns & ~FILE_H) << 9) & enemy & FULL
+            steps = ((single, -8), (double, -16), (left, -7), (right, -9))
+            last_rank = RANK_1
+
+        for targets, offset in steps:
+            for end in squares(targets & evasions):
+                start = end + offset
+                if start in pins and not pins[start] & (1 << end): continue
+                if (1 << end) & last_rank:
+                    for kind in (QUEEN, KNIGHT, ROOK, BISHOP): append(moves.encode(start, end, moves.PROMOTION, kind))
+                else: append(start | (end << 6))
+
+    # MAKE AND UNMAKE
+    def make(self, move: int) -> int:
+        """Plays a move and records how to take it back, returns the captured code"""
+        start, end, flag = move & 63, (move >> 6) & 63, (move >> 12) & 3
+        kind = self.squares[start] % 6
+
+        # CAPTURE, EN PASSANT TAKES THE PAWN BEHIND THE TARGET
+        target = end + (8 if self.turn == WHITE else -8) if flag == moves.EN_PASSANT else end
+        captured = self.squares[target]
+        self.history.append((move, captured, self.castling, self.passant, self.halfmove, self.key))
+        self.key ^= zobrist.CASTLING[self.castling] ^ self.passant_key()
+        if captured != EMPTY: self.remove(target)
+
+        # MOVE
+        self.relocate(start, end)
+        if flag == moves.CASTLING: self.relocate(*ROOK_CASTLING[end])
+        elif flag == moves.PROMOTION:
+            self.remove(end)
+            self.put(self.turn, moves.promotion(move), end)
+
+        # STATE
+        self.castling &= KEEP_RIGHTS[start] & KEEP_RIGHTS[end]
+        self.passant = (start + end) // 2 if kind == PAWN and abs(end - start) == 16 else -1
+        self.halfmove = 0 if kind == PAWN or captured != EMPTY else self.halfmove + 1
+        if self.turn == BLACK: self.fullmove += 1
+        self.turn ^= 1
+        self.key ^= zobrist.CASTLING[self.castling] ^ self.passant_key() ^ zobrist.SIDE
+        return captured
+
+    def unmake(self) -> int:
+        """Takes back the last move and returns it"""
+        move, captured, self.castling, self.passant, self.halfmove, key = self.history.pop()
+        start, end, flag = move & 63, (move >> 6) & 63, (move >> 12) & 3
+        self.turn ^= 1
+        if self.turn == BLACK: self.fullmove -= 1
+
+        # MOVE BACK
+        if flag == moves.PROMOTION:
+            self.remove(end)
+            self.put(self.turn, PAWN, end)
+        elif flag == moves.CASTLING: self.relocate(*reversed(ROOK_CASTLING[end]))
+        self.relocate(end, start)
+
+        # RESTORE CAPTURE
+        if flag == moves.EN_PASSANT:
+            sq = end + (8 if self.turn == WHITE else -8)
+            self.put(captured // 6, captured % 6, sq)
+        elif captured != EMPTY: self.put(captured // 6, captured % 6, end)
+        self.key = key
+        return move
+
+    def __repr__(self) -> str:
+        return '\n'.join(
+            ''.join('.' if (code := self.squares[square(x, y)]) == EMPTY else SYMBOLS[code] for x in range(8))
+            for y in range(8)
+        )
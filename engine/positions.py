@@ -0,0 +1,150 @@
+"""Index of the positions of a game archive, every key with the games and plies that reached it
+
+    python -m engine.positions build games.scga                  writes games.scpi with every core
+    python -m engine.positions build games.scga -w 4 -o out.scpi
+    python -m engine.positions probe games.scga --fen "..."      shows the games of a position and how they went on
+"""
+
+import os
+import sys
+import mmap
+import heapq
+import struct
+import argparse
+import tempfile
+import multiprocessing
+from collections import Counter
+from engine import moves
+from engine.archive import Archive, decode
+from engine.position import Position, START_FEN
+from engine.records import first_record
+
+# FORMAT, A HEADER AND THEN (KEY, GAME, PLY) RECORDS SORTED BY KEY, THE PLY IS THE MOVES PLAYED BEFORE THE POSITION
+MAGIC = b'SCPI'
+VERSION = 1
+HEADER = struct.Struct('<4sII')
+RECORD = struct.Struct('<QIH')
+EXTENSION = '.scpi'
+
+# GAMES EACH WORKER INDEXES AT ONCE, EVERY CHUNK IS ONE SORTED RUN MERGED AT THE END
+CHUNK = 2000
+BUFFER_SIZE = 1 << 20
+
+
+class PositionIndex:
+    """Sorted records of an index file mapped in memory"""
+    def __init__(self, path: str):
+        self.file = open(path, 'rb')
+        self.data = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, self.count = HEADER.unpack_from(self.data, 0)
+        if magic != MAGIC or version != VERSION: raise ValueError(f'{path} is not a position index of version {VERSION}')
+
+    def games(self, key: int) -> list[tuple[int, int]]:
+        """Returns the game and ply of every time a game reached the position, in game order"""
+        result = list()
+        for index in range(first_record(self.data, HEADER.size, RECORD, self.count, key), self.count):
+            record_key, game, ply = RECORD.unpack_from(self.data, HEADER.size + index * RECORD.size)
+            if record_key != key: break
+            result.append((game, ply))
+        return result
+
+    def continuations(self, key: int, archive: Archive) -> Counter:
+        """Returns how many games played each move from the position"""
+        counts = Counter()
+        for game, ply in self.games(key):
+            _, fen, indices = archive.entry(game)
+            if ply < len(indices): counts[decode(indices[:ply+1], fen)[-1]] += 1
+        return counts
+
+    def close(self) -> None:
+        """Unmaps the file"""
+        self.data.close()
+        self.file.close()
+
+    def __len__(self) -> int:
+        return self.count
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+
+# BUILDING, EVERY PROCESS OF THE POOL KEEPS THE ARCHIVE OPEN
+archive = None
+
+
+def prepare(path: str) -> None:
+    """Initializer of the pool, opens the archive of the process"""
+    global archive
+    archive = Archive(path)
+
+
+def index_games(job: tuple[int, int, str]) -> int:
+    """Writes the sorted records of a range of games to a run file in a worker, returns how many"""
+    first, last, run_path = job
+    records = list()
+    for game in range(first, last):
+        _, fen, indices = archive.entry(game)
+        position = Position(fen)
+        records.append((position.key, game, 0))
+        for ply, index in enumerate(indices, 1):
+            position.make(sorted(position.legal_moves())[index])
+            records.append((position.key, game, ply))
+    records.sort()
+    with open(run_path, 'wb') as f: f.write(b''.join(RECORD.pack(*record) for record in records))
+    return len(records)
+
+
+def build(archive_path: str, path: str=None, workers: int=None) -> int:
+    """Indexes every position of the archive, sorting runs in parallel and merging them, returns the records written"""
+    path = path or os.path.splitext(archive_path)[0] + EXTENSION
+    with Archive(archive_path) as games: count = len(games)
+
+    with tempfile.TemporaryDirectory(dir=os.path.dirname(os.path.abspath(path))) as directory:
+        jobs = [(first, min(first + CHUNK, count), os.path.join(directory, f'{first}.run')) for first in range(0, count, CHUNK)]
+        with multiprocessing.Pool(workers or os.cpu_count(), prepare, (archive_path,)) as pool:
+            total = sum(pool.imap_unordered(index_games, jobs))
+
+        # THE RUNS ARE READ IN PLACE, ONLY ONE RECORD OF EACH IS IN MEMORY WHILE MERGING
+        files = [open(run_path, 'rb') for _, _, run_path in jobs if os.path.getsize(run_path)]
+        runs = [mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) for f in files]
+        with open(path, 'wb', buffering=BUFFER_SIZE) as f:
+            f.write(HEADER.pack(MAGIC, VERSION, total))
+            for record in heapq.merge(*(RECORD.iter_unpack(run) for run in runs)): f.write(RECORD.pack(*record))
+        for run in runs: run.close()
+        for f in files: f.close()
+    return total
+
+
+def main(argv: list[str]=None) -> int:
+    """Builds or probes a position index, returns the exit code"""
+    parser = argparse.ArgumentParser(prog='python -m engine.positions', description='Position index of Star Chess game archives')
+    commands = parser.add_subparsers(dest='command', required=True)
+    builder = commands.add_parser('build', help='index every position of an archive')
+    builder.add_argument('archive')
+    builder.add_argument('-o', '--output', help='index file, the archive with the .scpi extension by default')
+    builder.add_argument('-w', '--workers', type=int, help='processes, every core by default')
+    prober = commands.add_parser('probe', help='show the games that reached a position')
+    prober.add_argument('archive')
+    prober.add_argument('-i', '--index', help='index file, the archive with the .scpi extension by default')
+    prober.add_argument('-f', '--fen', default=START_FEN)
+    prober.add_argument('-n', '--games', type=int, default=10, help='game numbers to show')
+    args = parser.parse_args(argv)
+
+    if args.command == 'build':
+        count = build(args.archive, args.output, args.workers)
+        print(f'{count} positions written to {args.output or os.path.splitext(args.archive)[0] + EXTENSION}')
+        return 0
+
+    key = Position(args.fen).key
+    with Archive(args.archive) as games, PositionIndex(args.index or os.path.splitext(args.archive)[0] + EXTENSION) as index:
+        found = index.games(key)
+        print(f'{len(found)} times in {len({game for game, _ in found})} games: {" ".join(f"{game}:{ply}" for game, ply in found[:args.games])}')
+        for move, count in index.continuations(key, games).most_common(): print(f'{moves.name(move)} {count}')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,13 @@
+"""Binary search of the fixed size records of the book and the position index, sorted by a key field"""
+
+import struct
+
+
+def first_record(data, offset: int, record: struct.Struct, count: int, key: int) -> int:
+    """Returns the index of the first of the sorted records whose key, their first field, is not below the key"""
+    low, high = 0, count
+    while low < high:
+        middle = (low + high) // 2
+        if record.unpack_from(data, offset + middle * record.size)[0] < key: low = middle + 1
+        else: high = middle
+    return low
@@ -0,0 +1,303 @@
+"""Iterative deepening principal variation search of the best move"""
+
+import time
+from engine import moves
+from engine.bitboard import *
+from engine.evaluation import evaluate
+from engine.position import Position, EMPTY
+from engine.tablebase import DRAW
+from engine.transposition import TranspositionTable, EXACT, LOWER, UPPER
+
+# SCORES, A SIDE WITHOUT MOVES LOSES SO STALEMATE IS ALSO A MATE
+INFINITE = 32000
+MATE = 30000
+MAX_PLY = 64
+
+# ORDERING, MOST VALUABLE VICTIM FIRST AND THE LEAST VALUABLE ATTACKER AMONG THEM
+MVV_LVA = [[(victim+1)*8 - attacker for attacker in range(6)] for victim in range(6)]
+BEST_ORDER = 1 << 30
+CAPTURE_ORDER = 1 << 26
+PROMOTION_ORDER = 1 << 25
+KILLER_ORDER = 1 << 24
+
+# NODES BETWEEN CLOCK CHECKS
+CHECK_EVERY = 255
+
+
+def to_table(score: int, ply: int) -> int:
+    """Stores mate scores as distance from the position instead of from the root"""
+    if score >= MATE - MAX_PLY: return score + ply
+    if score <= -MATE + MAX_PLY: return score - ply
+    return score
+
+
+def from_table(score: int, ply: int) -> int:
+    """Turns a stored mate score back into distance from the root"""
+    if score >= MATE - MAX_PLY: return score - ply
+    if score <= -MATE + MAX_PLY: return score + ply
+    return score
+
+
+class Timeout(Exception):
+    """Raised inside the search when the budget runs out"""
+
+
+class Search:
+    """Alpha-beta searcher with quiescence, killers and history kept between moves"""
+    def __init__(self, tt: TranspositionTable=None):
+        self.tt = tt or TranspositionTable()
+        self.history = [[0]*4096, [0]*4096]
+        self.stopped = False
+        self.info = None
+
+        # OTHER PROCESSES CAN STOP THE SEARCH WITH AN EVENT, HELPERS CAN SKIP THE FIRST DEPTHS
+        self.stop_event = None
+        self.first_depth = 1
+
+        # EVALUATION OF THE LEAVES, ANY FUNCTION OF THE POSITION FOR THE SIDE TO MOVE
+        self.evaluate = evaluate
+
+        # OPENING BOOK AND ENDGAME TABLES, THEIR MOVES ARE PLAYED WITHOUT SEARCHING
+        self.book = None
+        self.tablebase = None
+        self.reset()
+
+    def reset(self) -> None:
+        """Clears the results of the last search"""
+        self.nodes = 0
+        self.depth = 0
+        self.score = 0
+        self.best_move = 0
+        self.pv: list[int] = list()
+        self.start = time.perf_counter()
+        self.elapsed = 0
+        self.killers = [[0, 0] for _ in range(MAX_PLY + 1)]
+        self.pv_table: list[list[int]] = [list() for _ in range(MAX_PLY + 1)]
+
+    # LIMITS
+    def stop(self) -> None:
+        """Asks a running search to return its best move as soon as possible"""
+        self.stopped = True
+
+    def count(self) -> None:
+        """Counts a node and aborts when a limit is reached"""
+        self.nodes += 1
+        if self.nodes >= self.max_nodes: raise Timeout
+        if self.nodes & CHECK_EVERY: return
+        if self.stopped or (self.deadline and time.perf_counter() >= self.deadline): raise Timeout
+        if self.stop_event and self.stop_event.is_set(): raise Timeout
+
+    @property
+    def nps(self) -> float:
+        """Returns the nodes searched per second"""
+        return self.nodes / self.elapsed if self.elapsed else 0
+
+    # ROOT
+    def think(self, position: Position, time_limit: float=None, depth: int=MAX_PLY, nodes: int=None) -> int:
+        """Returns the best move within the time in seconds, depth and nodes given, 0 without moves"""
+        self.reset()
+        self.position = position
+        self.deadline = self.start + time_limit if time_limit else None
+        self.max_nodes = nodes or float('inf')
+        self.stopped = False
+        self.tt.new_search()
+        root = len(position.history)
+
+        legal_moves = position.legal_moves()
+        if not legal_moves: return 0
+        if self.book and (move := self.book.pick(position.key)) in legal_moves:
+            self.best_move = move
+            self.pv = [move]
+            return move
+        if self.tablebase and (move := self.tablebase.best_move(position, legal_moves)):
+            self.best_move = move
+            self.pv = [move]
+            return move
+        self.best_move = self.order(legal_moves, 0)[0]
+
+        for iteration in range(min(self.first_depth, depth), min(depth, MAX_PLY) + 1):
+            try: self.root(iteration, legal_moves)
+            except Timeout:
+                while len(position.history) > root: position.unmake()
+                break
+            self.depth = iteration
+            self.pv = self.pv_table[0]
+            self.elapsed = time.perf_counter() - self.start
+            if self.info: self.info(self)
+
+            # NOTHING LEFT TO LEARN WITH A FORCED MOVE OR A MATE FOUND
+            if len(legal_moves) == 1 or abs(self.score) >= MATE - MAX_PLY: break
+
+        self.elapsed = time.perf_counter() - self.start
+        return self.best_move
+
+    def analyse(self, position: Position, time_limit: float=None, depth: int=MAX_PLY) -> dict[int, int]:
+        """Returns the score of every legal move with a full window, each from the deepest iteration that reached it"""
+        self.reset()
+        self.position = position
+        self.deadline = self.start + time_limit if time_limit else None
+        self.max_nodes = float('inf')
+        self.stopped = False
+        self.tt.new_search()
+        root = len(position.history)
+
+        scores = dict()
+        legal_moves = position.legal_moves()
+        for iteration in range(1, min(depth, MAX_PLY) + 1):
+            try:
+                for move in self.order(legal_moves, 0, self.best_move):
+                    position.make(move)
+                    scores[move] = -self.negamax(iteration - 1, -INFINITE, INFINITE, 1)
+                    position.unmake()
+            except Timeout:
+                while len(position.history) > root: position.unmake()
+                break
+            self.depth = iteration
+            self.best_move = max(scores, key=scores.get, default=0)
+
+            # EVERY SCORE IS A MATE ALREADY OR THERE IS ONLY ONE MOVE TO SCORE
+            if len(legal_moves) <= 1 or all(abs(score) >= MATE - MAX_PLY for score in scores.values()): break
+
+        self.elapsed = time.perf_counter() - self.start
+        return scores
+
+    def root(self, depth: int, legal_moves: list[int]) -> None:
+        """Searches every root move, the best so far is kept even if the iteration is cut"""
+        position = self.position
+        alpha, beta = -INFINITE, INFINITE
+        self.pv_table[0] = list()
+        for i, move in enumerate(self.order(legal_moves, 0, self.best_move)):
+            position.make(move)
+            if i == 0: score = -self.negamax(depth-1, -beta, -alpha, 1)
+            else:
+                score = -self.negamax(depth-1, -alpha-1, -alpha, 1)
+                if score > alpha: score = -self.negamax(depth-1, -beta, -alpha, 1)
+            position.unmake()
+            if score > alpha:
+                alpha = score
+                self.best_move, self.score = move, score
+                self.pv_table[0] = [move] + self.pv_table[1]
+
+    # TREE
+    def negamax(self, depth: int, alpha: int, beta: int, ply: int) -> int:
+        """Principal variation search of a node"""
+        position = self.position
+        in_check = position.in_check()
+        if in_check: depth += 1
+        if depth <= 0 or ply >= MAX_PLY: return self.quiescence(alpha, beta, ply)
+        self.count()
+        self.pv_table[ply] = list()
+
+        # ENDGAMES IN THE TABLES ARE ALREADY SOLVED
+        if self.tablebase and (result := self.tablebase.probe(position)):
+            outcome, plies = result
+            return 0 if outcome == DRAW else outcome * (MATE - ply - plies)
+
+        # STORED RESULTS ONLY CUT OUTSIDE THE PRINCIPAL VARIATION, THE MOVE ALWAYS HELPS ORDERING
+        hash_move = 0
+        if entry := self.tt.probe(position.key):
+            hash_move, score, entry_depth, bound = entry
+            if entry_depth >= depth and beta - alpha == 1:
+                score = from_table(score, ply)
+                if bound == EXACT or (bound == LOWER and score >= beta) or (bound == UPPER and score <= alpha): return score
+
+        legal_moves = position.legal_moves()
+        if not legal_moves: return -MATE + ply
+
+        best, best_move, start_alpha = -INFINITE, 0, alpha
+        for i, move in enumerate(self.order(legal_moves, ply, hash_move)):
+            captured = position.make(move)
+            if i == 0: score = -self.negamax(depth-1, -beta, -alpha, ply+1)
+            else:
+                score = -self.negamax(depth-1, -alpha-1, -alpha, ply+1)
+                if alpha < score < beta: score = -self.negamax(depth-1, -beta, -alpha, ply+1)
+            position.unmake()
+
+            if score <= best: continue
+            best, best_move = score, move
+            if score <= alpha: continue
+            alpha = score
+            self.pv_table[ply] = [move] + self.pv_table[ply+1]
+            if score < beta: continue
+
+            # CUTOFF, QUIET MOVES ARE REMEMBERED AS KILLERS AND IN THE HISTORY
+            if captured == EMPTY and (move >> 12) & 3 != moves.PROMOTION: self.remember(move, depth, ply)
+            break
+
+        bound = LOWER if best >= beta else EXACT if best > start_alpha else UPPER
+        self.tt.store(position.key, depth, bound, to_table(best, ply), best_move)
+        return best
+
+    def quiescence(self, alpha: int, beta: int, ply: int) -> int:
+        """Searches captures and promotions until the position is quiet, every move when in check"""
+        self.count()
+        self.pv_table[ply] = list()
+        position = self.position
+        legal_moves = position.legal_moves()
+        if not legal_moves: return -MATE + ply
+        if ply >= MAX_PLY: return self.evaluate(position)
+
+        # STANDING PAT IS ONLY ALLOWED OUT OF CHECK
+        if position.in_check(): best, candidates = -INFINITE, legal_moves
+        else:
+            best = self.evaluate(position)
+            if best >= beta: return best
+            alpha = max(alpha, best)
+            codes = position.squares
+            candidates = [move for move in legal_moves if codes[(move >> 6) & 63] != EMPTY or self.tactical(move)]
+
+        for move in self.order(candidates, ply):
+            position.make(move)
+            score = -self.quiescence(-beta, -alpha, ply+1)
+            position.unmake()
+            if score <= best: continue
+            best = score
+            if score >= beta: break
+            alpha = max(alpha, score)
+        return best
+
+    # ORDERING
+    def order(self, legal_moves: list[int], ply: int, best_move: int=0) -> list[int]:
+        """Sorts the moves by best move, captures by MVV-LVA, promotions, killers and history"""
+        codes = self.position.squares
+        killers = self.killers[ply]
+        history = self.history[self.position.turn]
+
+        def priority(move: int) -> int:
+            if move == best_move: return BEST_ORDER
+            victim, flag = codes[(move >> 6) & 63], (move >> 12) & 3
+            if victim != EMPTY: return CAPTURE_ORDER + MVV_LVA[victim % 6][codes[move & 63] % 6]
+            if flag == moves.EN_PASSANT: return CAPTURE_ORDER + MVV_LVA[PAWN][PAWN]
+            if flag == moves.PROMOTION: return PROMOTION_ORDER + moves.promotion(move)
+            if move == killers[0]: return KILLER_ORDER + 1
+            if move == killers[1]: return KILLER_ORDER
+            return history[move & 4095]
+
+        return sorted(legal_moves, key=priority, reverse=True)
+
+    def tactical(self, move: int) -> bool:
+        """Checks if a move that lands on an empty square still changes the material"""
+        flag = (move >> 12) & 3
+        return flag == moves.EN_PASSANT or (flag == moves.PROMOTION and moves.promotion(move) == QUEEN)
+
+    def remember(self, move: int, depth: int, ply: int) -> None:
+        """Stores a quiet move that caused a cutoff"""
+        killers = self.killers[ply]
+        if killers[0] != move: killers[0], killers[1] = move, killers[0]
+        history = self.history[self.position.turn]
+        history[move & 4095] += depth * depth
+
+        # AGING KEEPS THE HISTORY BELOW THE KILLERS
+        if history[move & 4095] >= KILLER_ORDER:
+            for team in self.history:
+                for i, value in enumerate(team): team[i] = value // 2
+
+    # REPORT
+    def report(self) -> str:
+        """Returns the state of the search like an UCI info line"""
+        if abs(self.score) >= MATE - MAX_PLY:
+            plies = MATE - abs(self.score)
+            score = f'mate {(plies + 1) // 2 if self.score > 0 else -(plies // 2)}'
+        else: score = f'cp {self.score}'
+        pv = ' '.join(moves.name(move) for move in self.pv)
+        return f'depth {self.depth} score {score} nodes {self.nodes} nps {self.nps:.0f} hashfull {self.tt.fill()} time {self.elapsed*1000:.0f} pv {pv}'
@@ -0,0 +1,143 @@
+"""Lazy SMP search across processes sharing one transposition table
+
+    python -m engine.smp                     scales from one worker to every core
+    python -m engine.smp -w 1 4 16 -t 10     compares the given worker counts
+    python -m engine.smp --fen "..." -t 5    searches any position
+"""
+
+import os
+import sys
+import argparse
+import multiprocessing
+from multiprocessing.shared_memory import SharedMemory
+from engine import moves
+from engine.position import Position, START_FEN
+from engine.search import Search, MAX_PLY
+from engine.transposition import TranspositionTable, words, AGES
+
+# BENCHMARK
+KIWIPETE = 'r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1'
+
+
+def work(index: int, memory_name: str, jobs, results, stop_event) -> None:
+    """Loop of a worker process, searches every job until it receives None"""
+    memory = SharedMemory(name=memory_name)
+    tt = TranspositionTable(buffer=memory.buf.cast('Q'))
+    search = Search(tt)
+    search.stop_event = stop_event
+
+    # HALF OF THE HELPERS START ONE PLY DEEPER SO THE WORKERS DO NOT WALK THE SAME TREE
+    search.first_depth = 1 + index % 2
+
+    while (job := jobs.get()) is not None:
+        fen, time_limit, depth, nodes, age = job
+
+        # THE SEARCH AGES THE TABLE ON START, EVERY WORKER MUST END ON THE SAME AGE
+        tt.age = (age - 1) % AGES
+        move = search.think(Position(fen), time_limit, depth, nodes)
+        results.put((index, move, search.score, search.depth, search.nodes, search.nps, tt.hit_rate, search.pv))
+
+    tt.table.release()
+    memory.close()
+
+
+class ParallelSearch:
+    """Worker processes searching the same position, the deepest one decides the move"""
+    def __init__(self, workers: int=None, megabytes: int=64):
+        self.workers = workers or os.cpu_count()
+
+        # SHARED TABLE
+        self.memory = SharedMemory(create=True, size=words(megabytes) * 8)
+        self.tt = TranspositionTable(buffer=self.memory.buf.cast('Q'))
+        self.tt.clear()
+
+        # PROCESSES
+        self.stop_event = multiprocessing.Event()
+        self.results_queue = multiprocessing.Queue()
+        self.jobs = [multiprocessing.Queue() for _ in range(self.workers)]
+        self.processes = [
+            multiprocessing.Process(target=work, args=(index, self.memory.name, jobs, self.results_queue, self.stop_event), daemon=True)
+            for index, jobs in enumerate(self.jobs)
+        ]
+        for process in self.processes: process.start()
+
+        # RESULTS
+        self.results: list[tuple] = list()
+        self.best_move = 0
+        self.score = 0
+        self.depth = 0
+        self.nodes = 0
+        self.nps = 0
+        self.pv: list[int] = list()
+
+    def think(self, position: Position, time_limit: float=None, depth: int=MAX_PLY, nodes: int=None) -> int:
+        """Returns the move of the deepest worker, the first one to finish stops the rest"""
+        self.tt.new_search()
+        self.stop_event.clear()
+        fen = position.fen()
+        share = nodes // self.workers if nodes else None
+        for jobs in self.jobs: jobs.put((fen, time_limit, depth, share, self.tt.age))
+
+        self.results = [None] * self.workers
+        for _ in range(self.workers):
+            index, *result = self.results_queue.get()
+            self.results[index] = result
+            self.stop_event.set()
+
+        # DEEPEST COMPLETED ITERATION WINS, THE FIRST WORKER BREAKS TIES
+        best = max(range(self.workers), key=lambda index: (self.results[index][2], -index))
+        self.best_move, self.score, self.depth, _, _, _, self.pv = self.results[best]
+        self.nodes = sum(result[3] for result in self.results)
+        self.nps = sum(result[4] for result in self.results)
+        return self.best_move
+
+    def stop(self) -> None:
+        """Asks every worker to return its best move as soon as possible"""
+        self.stop_event.set()
+
+    def report(self) -> str:
+        """Returns the root move, depth and speed of each worker and the total"""
+        lines = list()
+        for index, (move, score, depth, nodes, nps, hit_rate, _) in enumerate(self.results):
+            lines.append(f'worker {index}: {moves.name(move) if move else "-"} depth {depth} score {score} nodes {nodes} nps {nps:.0f} hits {hit_rate:.1%}')
+        lines.append(f'total: {moves.name(self.best_move) if self.best_move else "-"} depth {self.depth} nodes {self.nodes} nps {self.nps:.0f} hashfull {self.tt.fill()}')
+        return '\n'.join(lines)
+
+    def close(self) -> None:
+        """Stops the workers and frees the shared table"""
+        self.stop_event.set()
+        for jobs in self.jobs: jobs.put(None)
+        for process in self.processes: process.join()
+        self.tt.table.release()
+        self.memory.close()
+        self.memory.unlink()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+
+def main(argv: list[str]=None) -> int:
+    """Searches a position with each worker count and prints how the speed scales"""
+    parser = argparse.ArgumentParser(prog='python -m engine.smp', description='Lazy SMP scaling of the Star Chess engine')
+    parser.add_argument('-w', '--workers', type=int, nargs='+', help='worker counts, powers of two up to every core by default')
+    parser.add_argument('-t', '--time', type=float, default=5, help='seconds per search')
+    parser.add_argument('-f', '--fen', default=KIWIPETE, help='position to search, kiwipete by default')
+    parser.add_argument('--hash', type=int, default=64, help='megabytes of the shared table')
+    args = parser.parse_args(argv)
+
+    counts = args.workers or [1 << i for i in range(os.cpu_count().bit_length()) if 1 << i <= os.cpu_count()]
+    single = None
+    for workers in counts:
+        with ParallelSearch(workers, args.hash) as search:
+            search.think(Position(args.fen or START_FEN), args.time)
+            print(search.report())
+        single = single or search.nps / workers
+        print(f'{workers} workers: {search.nps:,.0f} nodes/s, {search.nps / single:.1f}x one worker\n')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,483 @@
+"""Endgame tablebases of three and four pieces built by retrograde analysis
+
+    python -m engine.tablebase generate                  every table up to four pieces on every core
+    python -m engine.tablebase generate KQvK KRvK -w 4   the given tables and the ones they need
+    python -m engine.tablebase probe --fen "..."         shows the result of a position
+"""
+
+import os
+import sys
+import mmap
+import time
+import struct
+import argparse
+import multiprocessing
+from array import array
+from itertools import combinations_with_replacement
+from engine import moves
+from engine.bitboard import *
+from engine.position import Position, EMPTY
+
+# FORMAT, A HEADER AND THEN ONE ENTRY OF BITS PER INDEX, 0 IS A DRAW AND ANY OTHER VALUE IS PLIES+1
+MAGIC = b'SCTB'
+VERSION = 1
+HEADER = struct.Struct('<4sHHI')
+EXTENSION = '.sctb'
+
+# RESULTS FOR THE SIDE TO MOVE, AN ODD DISTANCE IS ALWAYS A WIN AND AN EVEN ONE A LOSS
+LOSS, DRAW, WIN = -1, 0, 1
+MAX_PIECES = 4
+LETTERS = 'PNBRQK'
+EMPTY_FEN = '8/8/8/8/8/8/8/8 w - - 0 1'
+
+# GENERATION CHUNKS
+CLASSIFY_CHUNK = 4096
+FRONTIER_CHUNK = 1024
+
+# DEFAULT FOLDER NEXT TO THE ENGINE
+TABLEBASE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'tablebases')
+
+
+# SYMMETRIES, THE IDENTITY AND THE LEFT-RIGHT MIRROR COME FIRST BECAUSE PAWNS ONLY ALLOW THOSE
+def _transform(sq: int, mirror: bool, flip: bool, swap: bool) -> int:
+    """Returns the square after swapping the axes, mirroring the files and flipping the ranks"""
+    x, y = sq & 7, sq >> 3
+    if swap: x, y = y, x
+    if mirror: x = 7 - x
+    if flip: y = 7 - y
+    return square(x, y)
+
+
+def _king_pairs(symmetries: list[tuple[int, ...]]) -> dict[tuple[int, int], int]:
+    """Numbers the king placements that are the smallest of their symmetric ones"""
+    pairs = dict()
+    for white in range(64):
+        for black in range(64):
+            if white == black or black in KING_TARGETS[white]: continue
+            if min(symmetry[white] * 64 + symmetry[black] for symmetry in symmetries) != white * 64 + black: continue
+            pairs[(white, black)] = len(pairs)
+    return pairs
+
+
+SYMMETRIES = [tuple(_transform(sq, mirror, flip, swap) for sq in range(64)) for swap in (0, 1) for flip in (0, 1) for mirror in (0, 1)]
+PAWN_SYMMETRIES = SYMMETRIES[:2]
+KING_PAIRS = _king_pairs(SYMMETRIES)
+PAWN_KING_PAIRS = _king_pairs(PAWN_SYMMETRIES)
+
+
+# MATERIAL
+def strength(kinds: list[int]) -> tuple:
+    """Orders the sides by number of pieces and then by the best ones"""
+    return len(kinds), sorted(kinds, reverse=True)
+
+
+def material_name(white: list[int], black: list[int]) -> tuple[str, bool]:
+    """Returns the name of the table of the pieces and if the colors must be swapped to use it"""
+    flipped = strength(black) > strength(white)
+    if flipped: white, black = black, white
+    name = 'K' + ''.join(LETTERS[kind] for kind in sorted(white, reverse=True))
+    name += 'vK' + ''.join(LETTERS[kind] for kind in sorted(black, reverse=True))
+    return name, flipped
+
+
+def materials(pieces: int=MAX_PIECES) -> list[str]:
+    """Returns the name of every table up to the pieces given, in the order they are generated"""
+    names = set()
+    kinds = (PAWN, KNIGHT, BISHOP, ROOK, QUEEN)
+    for count in range(1, pieces - 1):
+        for white_count in range(count + 1):
+            for white in combinations_with_replacement(kinds, white_count):
+                for black in combinations_with_replacement(kinds, count - white_count):
+                    names.add(material_name(list(white), list(black))[0])
+    return sorted(names, key=generation_order)
+
+
+def generation_order(name: str) -> tuple:
+    """Tables with fewer pieces go first and then the ones with fewer pawns, which promote into them"""
+    return len(name) - 1, name.count('P'), name
+
+
+def dependencies(name: str) -> set[str]:
+    """Returns the tables reached by a capture or a promotion, the bare kings are always a draw"""
+    white, black = (list(LETTERS.index(char) for char in side[1:]) for side in name.split('v'))
+    result = set()
+    for side, other, swap in ((white, black, False), (black, white, True)):
+        for i, kind in enumerate(side):
+            rest = side[:i] + side[i+1:]
+            reached = [rest]
+            if kind == PAWN: reached += [rest + [promotion] for promotion in (KNIGHT, BISHOP, ROOK, QUEEN)]
+            for pieces in reached:
+                if not pieces and not other: continue
+                result.add(material_name(other, pieces)[0] if swap else material_name(pieces, other)[0])
+    return result
+
+
+class Material:
+    """Pieces of a table and the index of its positions, kings first by symmetry and then each piece square"""
+    def __init__(self, name: str):
+        self.name = name
+        white, black = name.split('v')
+        self.pieces = [(WHITE, LETTERS.index(char)) for char in white[1:]] + [(BLACK, LETTERS.index(char)) for char in black[1:]]
+        self.pawns = any(kind == PAWN for _, kind in self.pieces)
+        self.symmetries = PAWN_SYMMETRIES if self.pawns else SYMMETRIES
+        self.pairs = PAWN_KING_PAIRS if self.pawns else KING_PAIRS
+        self.pair_list = list(self.pairs)
+        self.size = 2 * len(self.pairs) * 64 ** len(self.pieces)
+
+        # IDENTICAL PIECES ARE SORTED BY SQUARE SO SWAPPING THEM GIVES THE SAME INDEX
+        self.groups = list()
+        start = 0
+        for i in range(1, len(self.pieces) + 1):
+            if i < len(self.pieces) and self.pieces[i] == self.pieces[start]: continue
+            if i - start > 1: self.groups.append((start, i))
+            start = i
+
+    def index(self, turn: int, white_king: int, black_king: int, sqs: list[int]) -> int:
+        """Returns the smallest index among the symmetric positions, -1 if the kings touch"""
+        best = -1
+        for symmetry in self.symmetries:
+            pair = self.pairs.get((symmetry[white_king], symmetry[black_king]))
+            if pair is None: continue
+            mapped = [symmetry[sq] for sq in sqs]
+            for start, stop in self.groups: mapped[start:stop] = sorted(mapped[start:stop])
+            index = turn * len(self.pairs) + pair
+            for sq in mapped: index = index * 64 + sq
+            if best < 0 or index < best: best = index
+        return best
+
+    def decode(self, index: int) -> tuple[int, int, int, list[int]]:
+        """Returns the turn, kings and piece squares of an index"""
+        sqs = list()
+        for _ in self.pieces:
+            index, sq = divmod(index, 64)
+            sqs.append(sq)
+        sqs.reverse()
+        turn, pair = divmod(index, len(self.pairs))
+        return (turn, *self.pair_list[pair], sqs)
+
+    def locate(self, position: Position, flipped: bool=False) -> int:
+        """Returns the index of a position with this material, swapping the colors if asked"""
+        pieces = position.bitboards.pieces
+        turn = position.turn
+        flip = 56 if flipped else 0
+        if flipped: pieces, turn = pieces[::-1], 1 - turn
+
+        sqs, seen = list(), dict()
+        for team, kind in self.pieces:
+            found = squares(pieces[team][kind])
+            sqs.append(found[seen.setdefault((team, kind), 0)] ^ flip)
+            seen[(team, kind)] += 1
+        return self.index(turn, lsb(pieces[WHITE][KING]) ^ flip, lsb(pieces[BLACK][KING]) ^ flip, sqs)
+
+    def setup(self, position: Position, index: int) -> bool:
+        """Places the position of the index, returns False if it is not a legal canonical one"""
+        turn, white_king, black_king, sqs = self.decode(index)
+        if len(set(sqs)) != len(sqs) or white_king in sqs or black_king in sqs: return False
+        if any(kind == PAWN and sq >> 3 in (0, 7) for (_, kind), sq in zip(self.pieces, sqs)): return False
+        if self.index(turn, white_king, black_king, sqs) != index: return False
+
+        position.clear()
+        position.put(WHITE, KING, white_king)
+        position.put(BLACK, KING, black_king)
+        for (team, kind), sq in zip(self.pieces, sqs): position.put(team, kind, sq)
+        position.turn = turn
+        return not position.in_check(1 - turn)
+
+
+# FILES
+class Table:
+    """Bit packed entries of one material mapped in memory"""
+    def __init__(self, path: str):
+        self.file = open(path, 'rb')
+        self.data = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, self.bits, self.count = HEADER.unpack_from(self.data, 0)
+        if magic != MAGIC or version != VERSION: raise ValueError(f'{path} is not a tablebase of version {VERSION}')
+        self.mask = (1 << self.bits) - 1
+
+    def __getitem__(self, index: int) -> int:
+        bit = index * self.bits
+        offset = HEADER.size + (bit >> 3)
+        return (int.from_bytes(self.data[offset:offset+3], 'little') >> (bit & 7)) & self.mask
+
+    def close(self) -> None:
+        """Unmaps the file"""
+        self.data.close()
+        self.file.close()
+
+
+def write(path: str, values: array) -> int:
+    """Packs the entries with the fewest bits that hold the largest one, returns the bits used"""
+    bits = max(max(values, default=0).bit_length(), 1)
+    packed = bytearray()
+    buffer, filled = 0, 0
+    for value in values:
+        buffer |= value << filled
+        filled += bits
+        while filled >= 8:
+            packed.append(buffer & 0xFF)
+            buffer >>= 8
+            filled -= 8
+    if filled: packed.append(buffer)
+
+    with open(path, 'wb') as f:
+        f.write(HEADER.pack(MAGIC, VERSION, bits, len(values)))
+        f.write(packed)
+    return bits
+
+
+class Tablebase:
+    """Every table of a folder, each one opened the first time a position needs it"""
+    def __init__(self, directory: str=TABLEBASE_PATH):
+        self.directory = directory
+        self.tables: dict[str, tuple[Material, Table] | None] = dict()
+
+    def table(self, name: str) -> tuple[Material, Table] | None:
+        """Returns the material and entries of a table, None if the file does not exist"""
+        if name not in self.tables:
+            path = os.path.join(self.directory, name + EXTENSION)
+            self.tables[name] = (Material(name), Table(path)) if os.path.exists(path) else None
+        return self.tables[name]
+
+    def probe(self, position: Position) -> tuple[int, int] | None:
+        """Returns the result and plies to the end for the side to move, None without table"""
+        bitboards = position.bitboards
+        count = bitboards.occupied.bit_count()
+        if count > MAX_PIECES or position.castling: return None
+        if not bitboards.pieces[WHITE][KING] or not bitboards.pieces[BLACK][KING]: return None
+        if count == 2: return DRAW, 0
+
+        white = [kind for kind in range(KING) for _ in squares(bitboards.pieces[WHITE][kind])]
+        black = [kind for kind in range(KING) for _ in squares(bitboards.pieces[BLACK][kind])]
+        name, flipped = material_name(white, black)
+        if not (table := self.table(name)): return None
+        material, entries = table
+        if not (value := entries[material.locate(position, flipped)]): result = DRAW, 0
+        else: result = (WIN if value & 1 == 0 else LOSS), value - 1
+
+        # THE TABLES ARE SOLVED WITHOUT EN PASSANT, AN AVAILABLE CAPTURE IS PROBED AND KEPT IF IT DOES BETTER
+        if position.passant_key():
+            for move in position.legal_moves():
+                if (move >> 12) & 3 != moves.EN_PASSANT: continue
+                position.make(move)
+                child = self.probe(position)
+                position.unmake()
+                if child is None: return None
+                outcome, plies = child
+                result = max(result, (-outcome, plies + 1), key=rank)
+        return result
+
+    def best_move(self, position: Position, legal_moves: list[int]=None) -> int:
+        """Returns the move that wins fastest, draws or loses slowest, 0 if a position is missing"""
+        if legal_moves is None: legal_moves = position.legal_moves()
+        best, best_rank = 0, None
+        for move in legal_moves:
+            position.make(move)
+            result = self.probe(position)
+            position.unmake()
+            if result is None: return 0
+
+            # THE RESULT IS FOR THE OPPONENT
+            outcome, plies = result
+            rank = (-outcome, plies if outcome == WIN else -plies)
+            if best_rank is None or rank > best_rank: best, best_rank = move, rank
+        return best
+
+    def close(self) -> None:
+        """Unmaps every open table"""
+        for table in self.tables.values():
+            if table: table[1].close()
+        self.tables.clear()
+
+
+def load(directory: str=TABLEBASE_PATH) -> Tablebase | None:
+    """Opens the folder of tables if it exists"""
+    return Tablebase(directory) if os.path.isdir(directory) else None
+
+
+def rank(result: tuple[int, int]) -> tuple[int, int]:
+    """Returns a key that orders the results for the side to move, faster wins and slower losses first"""
+    outcome, plies = result
+    return outcome, -plies if outcome == WIN else plies
+
+
+def describe(result: tuple[int, int]) -> str:
+    """Returns a result as text, the distance in moves of the side that wins"""
+    outcome, plies = result
+    if outcome == DRAW: return 'draw'
+    return f'{"win" if outcome == WIN else "loss"} in {(plies + 1) // 2}'
+
+
+# GENERATION, EVERY PROCESS OF THE POOL KEEPS ITS OWN BUILDER
+builder = None
+
+
+class Builder:
+    """Classifies positions and walks moves backwards for one material inside a worker"""
+    def __init__(self, name: str, directory: str):
+        self.material = Material(name)
+        self.tablebase = Tablebase(directory)
+        self.position = Position(EMPTY_FEN)
+
+    def classify(self, start: int, stop: int) -> tuple[int, list[array]]:
+        """Returns valid, successors, exit win, exit loss and safe flags of a range of indices"""
+        material, position, tablebase = self.material, self.position, self.tablebase
+        size = stop - start
+        valid, successors, wins, losses, safe = (array('B', [0]) * size for _ in range(5))
+
+        for i in range(size):
+            if not material.setup(position, start + i): continue
+            valid[i] = 1
+
+            # CAPTURES AND PROMOTIONS LEAVE THE TABLE, THE TABLES THEY REACH ARE ALREADY KNOWN
+            inside, win, loss, draw = set(), 0, 0, False
+            for move in position.legal_moves():
+                captured = position.make(move)
+                if captured == EMPTY and (move >> 12) & 3 != moves.PROMOTION: inside.add(material.locate(position))
+                else:
+                    if (result := tablebase.probe(position)) is None: raise RuntimeError(f'no table for {position.fen()}')
+                    outcome, plies = result
+                    if outcome == LOSS: win = min(win or plies + 1, plies + 1)
+                    elif outcome == WIN: loss = max(loss, plies + 1)
+                    else: draw = True
+                position.unmake()
+
+            successors[i], wins[i], losses[i], safe[i] = len(inside), win, loss, draw or bool(win)
+        return start, [valid, successors, wins, losses, safe]
+
+    def predecessors(self, index: int) -> set[int]:
+        """Returns the positions that reach the index with a move that stays in the table"""
+        material = self.material
+        turn, white_king, black_king, sqs = material.decode(index)
+        mover = 1 - turn
+        pieces = [(WHITE, KING), (BLACK, KING)] + material.pieces
+        placed = [white_king, black_king] + sqs
+        occupied = set(placed)
+
+        result = set()
+        for slot, ((team, kind), sq) in enumerate(zip(pieces, placed)):
+            if team != mover: continue
+
+            # EVERY PIECE BUT THE PAWN MOVES BACK THE SAME WAY IT MOVES FORWARD
+            if kind == KING: origins = [end for end in KING_TARGETS[sq] if end not in occupied]
+            elif kind == KNIGHT: origins = [end for end in KNIGHT_TARGETS[sq] if end not in occupied]
+            elif kind == PAWN:
+                back = 8 if team == WHITE else -8
+                origins = list()
+                if (sq + back) not in occupied and 1 <= (sq + back) >> 3 <= 6:
+                    origins.append(sq + back)
+                    if sq >> 3 == (4 if team == WHITE else 3) and (sq + 2*back) not in occupied: origins.append(sq + 2*back)
+            else:
+                origins = list()
+                for ray in (BISHOP_RAYS, ROOK_RAYS, QUEEN_RAYS)[kind - BISHOP][sq]:
+                    for end in ray:
+                        if end in occupied: break
+                        origins.append(end)
+
+            for origin in origins:
+                placed[slot] = origin
+                if (previous := material.index(mover, placed[0], placed[1], placed[2:])) >= 0: result.add(previous)
+            placed[slot] = sq
+        return result
+
+
+def prepare(name: str, directory: str) -> None:
+    """Initializer of the pool, creates the builder of the process"""
+    global builder
+    builder = Builder(name, directory)
+
+
+def classify(chunk: tuple[int, int]) -> tuple[int, list[array]]:
+    """Classifies a range of indices in a worker"""
+    return builder.classify(*chunk)
+
+
+def predecessors(frontier: list[int]) -> list[array]:
+    """Walks back from every index of the frontier in a worker"""
+    return [array('I', builder.predecessors(index)) for index in frontier]
+
+
+def generate(name: str, directory: str=TABLEBASE_PATH, workers: int=None) -> tuple[int, int, int, int]:
+    """Solves a table from the tables it reaches and writes it, returns the wins, draws, losses and longest distance"""
+    material = Material(name)
+    size = material.size
+    with multiprocessing.Pool(workers or os.cpu_count(), prepare, (name, directory)) as pool:
+
+        # EVERY POSITION KNOWS ITS MOVES INSIDE THE TABLE AND THE BEST RESULT OF THOSE THAT LEAVE IT
+        valid, successors, wins, losses, safe = (array('B', [0]) * size for _ in range(5))
+        chunks = [(start, min(start + CLASSIFY_CHUNK, size)) for start in range(0, size, CLASSIFY_CHUNK)]
+        for start, parts in pool.imap_unordered(classify, chunks):
+            for whole, part in zip((valid, successors, wins, losses, safe), parts): whole[start:start+len(part)] = part
+
+        # POSITIONS DECIDED BY THEIR EXITS ALONE WAIT FOR THEIR DISTANCE
+        buckets: dict[int, array] = dict()
+        for index in range(size):
+            if not valid[index]: continue
+            if wins[index]: buckets.setdefault(wins[index], array('I')).append(index)
+            elif not successors[index] and not safe[index]: buckets.setdefault(losses[index], array('I')).append(index)
+
+        # RETROGRADE, EACH DISTANCE DECIDES ITS POSITIONS AND THEIR PREDECESSORS WAIT FOR THE NEXT ONES
+        values = array('H', [0]) * size
+        level = 0
+        while buckets:
+            frontier = sorted({index for index in buckets.pop(level, ()) if not values[index]})
+            for index in frontier: values[index] = level + 1
+            chunks = [frontier[i:i+FRONTIER_CHUNK] for i in range(0, len(frontier), FRONTIER_CHUNK)]
+            for found in pool.imap_unordered(predecessors, chunks):
+                for previous in found:
+                    for index in previous:
+                        if not valid[index] or values[index]: continue
+
+                        # A MOVE INTO A LOSS WINS, A POSITION IS LOST ONCE EVERY MOVE REACHES A WIN
+                        if level & 1 == 0: buckets.setdefault(level + 1, array('I')).append(index)
+                        else:
+                            successors[index] -= 1
+                            losses[index] = max(losses[index], level + 1)
+                            if not successors[index] and not safe[index]: buckets.setdefault(losses[index], array('I')).append(index)
+            level += 1
+
+    os.makedirs(directory, exist_ok=True)
+    write(os.path.join(directory, name + EXTENSION), values)
+    decided = [value for value in values if value]
+    win_count = sum(1 for value in decided if value & 1 == 0)
+    draw_count = sum(valid) - len(decided)
+    return win_count, draw_count, len(decided) - win_count, max(decided, default=1) - 1
+
+
+def main(argv: list[str]=None) -> int:
+    """Generates or probes the tables, returns the exit code"""
+    parser = argparse.ArgumentParser(prog='python -m engine.tablebase', description='Endgame tablebases of Star Chess')
+    commands = parser.add_subparsers(dest='command', required=True)
+    generator = commands.add_parser('generate', help='solve the tables by retrograde analysis')
+    generator.add_argument('materials', nargs='*', help=f'tables like KQvK, every one up to {MAX_PIECES} pieces by default')
+    generator.add_argument('-o', '--output', default=TABLEBASE_PATH)
+    generator.add_argument('-w', '--workers', type=int, help='processes, every core by default')
+    generator.add_argument('--force', action='store_true', help='solve the tables that already exist again')
+    prober = commands.add_parser('probe', help='show the result of a position')
+    prober.add_argument('-f', '--fen', required=True)
+    prober.add_argument('-d', '--directory', default=TABLEBASE_PATH)
+    args = parser.parse_args(argv)
+
+    if args.command == 'probe':
+        tablebase = Tablebase(args.directory)
+        position = Position(args.fen)
+        if (result := tablebase.probe(position)) is None: print('not in the tablebase')
+        else: print(f'{describe(result)}, best move {moves.name(tablebase.best_move(position))}')
+        return 0
+
+    # THE TABLES GIVEN AND EVERY TABLE THEY NEED
+    names, pending = set(), list(args.materials or materials())
+    while pending:
+        if (name := pending.pop()) in names: continue
+        names.add(name)
+        pending.extend(dependencies(name))
+
+    for name in sorted(names, key=generation_order):
+        if not args.force and os.path.exists(os.path.join(args.output, name + EXTENSION)): continue
+        start = time.perf_counter()
+        win_count, draw_count, loss_count, longest = generate(name, args.output, args.workers)
+        print(f'{name}: {win_count} wins, {draw_count} draws, {loss_count} losses, longest {longest} plies, {time.perf_counter() - start:.1f}s')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
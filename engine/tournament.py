@@ -0,0 +1,185 @@
+"""Engine against engine matches between two configurations across a process pool
+
+    python -m engine.tournament --first depth=3 --second depth=4 -g 200
+    python -m engine.tournament --first time=0.1 --second time=0.1,eval=middlegame -g 2000 -w 16 -o games.scga
+    python -m engine.tournament --first nodes=5000 --second nodes=5000,tempo=10 --random-plies 6
+
+    Configurations are comma separated depth, time, nodes, eval (tapered, middlegame, endgame), tempo and hash
+"""
+
+import os
+import sys
+import math
+import time
+import random
+import argparse
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from engine import book
+from engine.bitboard import *
+from engine.archive import ArchiveWriter
+from engine.evaluation import EVALUATIONS
+from engine.position import Position
+from engine.search import Search
+from engine.transposition import TranspositionTable
+
+# CONFIGURATION KEYS AND THEIR TYPES, A CONFIGURATION WITHOUT LIMITS SEARCHES TO DEFAULT_DEPTH
+OPTIONS = {'depth': int, 'time': float, 'nodes': int, 'eval': str, 'tempo': int, 'hash': int}
+DEFAULT_DEPTH = 3
+DEFAULT_HASH = 16
+
+# ADJUDICATION, GAMES WITHOUT A WINNER END AS DRAWS
+MAX_PLIES = 400
+FIFTY_MOVES = 100
+
+# OPENINGS
+BOOK_PLIES = 12
+
+
+def parse_config(text: str) -> dict:
+    """Returns the configuration written as key=value pairs"""
+    config = {'depth': None, 'time': None, 'nodes': None, 'eval': 'tapered', 'tempo': 0, 'hash': DEFAULT_HASH}
+    for item in filter(None, text.split(',')):
+        key, value = item.split('=')
+        if key not in OPTIONS: raise ValueError(f'unknown option {key}, use {", ".join(OPTIONS)}')
+        config[key] = OPTIONS[key](value)
+    if config['eval'] not in EVALUATIONS: raise ValueError(f'unknown evaluation {config["eval"]}, use {", ".join(EVALUATIONS)}')
+    if not (config['depth'] or config['time'] or config['nodes']): config['depth'] = DEFAULT_DEPTH
+    return config
+
+
+class Player:
+    """Search of one configuration, reused for every game of a worker"""
+    def __init__(self, config: dict):
+        self.config = config
+        self.search = Search(TranspositionTable(config['hash']))
+        evaluate, tempo = EVALUATIONS[config['eval']], config['tempo']
+        if tempo: self.search.evaluate = lambda position: evaluate(position) + tempo
+        else: self.search.evaluate = evaluate
+
+    def move(self, position: Position) -> int:
+        """Returns the move of the configuration, the position is left as it was"""
+        config = self.config
+        return self.search.think(position, config['time'], config['depth'] or 64, config['nodes'])
+
+
+def adjudicate(position: Position) -> str | None:
+    """Returns the result once the game is over, the side without moves loses"""
+    if not position.legal_moves(): return '0-1' if position.turn == WHITE else '1-0'
+    if position.halfmove >= FIFTY_MOVES or len(position.history) >= MAX_PLIES: return '1/2-1/2'
+
+    # THREEFOLD REPETITION, ONLY POSITIONS SINCE THE LAST CAPTURE OR PAWN MOVE CAN REPEAT
+    recent = position.history[-position.halfmove:] if position.halfmove else ()
+    if sum(1 for entry in recent if entry[5] == position.key) >= 2: return '1/2-1/2'
+    return None
+
+
+# EVERY PROCESS OF THE POOL KEEPS BOTH PLAYERS
+players = None
+
+
+def prepare(first: dict, second: dict) -> None:
+    """Initializer of the pool, creates the players of the process"""
+    global players
+    players = (Player(first), Player(second))
+
+
+def play(opening: list[int], first_white: bool) -> tuple:
+    """Plays one game from the opening, returns its moves, result, nodes, seconds and process"""
+    start = time.perf_counter()
+    position = Position()
+    for move in opening: position.make(move)
+    white, black = players if first_white else players[::-1]
+
+    nodes = 0
+    while (result := adjudicate(position)) is None:
+        player = white if position.turn == WHITE else black
+        move = player.move(position)
+        nodes += player.search.nodes
+        position.make(move)
+    return [entry[0] for entry in position.history], result, nodes, time.perf_counter() - start, os.getpid()
+
+
+def openings(count: int, opening_book: book.Book | None, random_plies: int, seed: int) -> list[list[int]]:
+    """Returns the starting moves of each pair of games, book moves first and then random ones"""
+    rng = random.Random(seed)
+    lines = list()
+    for _ in range(count):
+        position = Position()
+        while opening_book and len(position.history) < BOOK_PLIES:
+            book_moves = [(move, weight) for move, weight in opening_book.moves(position.key) if move in position.legal_moves()]
+            if not book_moves: break
+            position.make(rng.choices([move for move, _ in book_moves], [weight for _, weight in book_moves])[0])
+        for _ in range(random_plies):
+            if not (legal_moves := position.legal_moves()): break
+            position.make(rng.choice(legal_moves))
+        lines.append([entry[0] for entry in position.history])
+    return lines
+
+
+def elo(wins: int, draws: int, losses: int) -> tuple[float, float]:
+    """Returns the Elo difference of the score and its 95% error"""
+    games = wins + draws + losses
+    score = (wins + draws / 2) / games
+    variance = (wins * (1 - score)**2 + draws * (0.5 - score)**2 + losses * score**2) / games
+    error = 1.96 * math.sqrt(variance / games)
+
+    def difference(p: float) -> float:
+        p = min(max(p, 1e-6), 1 - 1e-6)
+        return -400 * math.log10(1 / p - 1)
+
+    return difference(score), (difference(score + error) - difference(score - error)) / 2
+
+
+def main(argv: list[str]=None) -> int:
+    """Plays the match and reports the Elo difference of the first configuration, returns the exit code"""
+    parser = argparse.ArgumentParser(prog='python -m engine.tournament', description='Self-play matches of the Star Chess engine')
+    parser.add_argument('--first', default='', help='configuration whose Elo difference is reported')
+    parser.add_argument('--second', default='', help='configuration it plays against')
+    parser.add_argument('-g', '--games', type=int, default=100, help='games, every opening is played with both colors')
+    parser.add_argument('-w', '--workers', type=int, help='processes, every core by default')
+    parser.add_argument('-b', '--book', default=book.BOOK_PATH, help='opening book, skipped if it does not exist')
+    parser.add_argument('-r', '--random-plies', type=int, default=4, help='random moves after the book')
+    parser.add_argument('-o', '--output', help='game archive the games are appended to')
+    parser.add_argument('-s', '--seed', type=int, default=0)
+    parser.add_argument('--report', type=int, default=50, help='games between progress lines')
+    args = parser.parse_args(argv)
+
+    first, second = parse_config(args.first), parse_config(args.second)
+    opening_book = book.load(args.book)
+    lines = openings((args.games + 1) // 2, opening_book, args.random_plies, args.seed)
+    if opening_book: opening_book.close()
+
+    writer = ArchiveWriter(args.output) if args.output else None
+    wins = draws = losses = 0
+    workers: dict[int, list] = dict()
+    start = time.perf_counter()
+    with ProcessPoolExecutor(args.workers or os.cpu_count(), initializer=prepare, initargs=(first, second)) as executor:
+        jobs = {executor.submit(play, lines[i // 2], i % 2 == 0): i for i in range(args.games)}
+        for done, job in enumerate(as_completed(jobs), 1):
+            game_moves, result, nodes, seconds, pid = job.result()
+            if writer: writer.write(game_moves, result)
+
+            # RESULT OF THE FIRST CONFIGURATION, WHITE IN THE EVEN GAMES
+            first_white = jobs[job] % 2 == 0
+            if result == '1/2-1/2': draws += 1
+            elif (result == '1-0') == first_white: wins += 1
+            else: losses += 1
+
+            stats = workers.setdefault(pid, [0, 0, 0.0])
+            stats[0] += 1
+            stats[1] += nodes
+            stats[2] += seconds
+
+            if done % args.report == 0 or done == args.games:
+                difference, error = elo(wins, draws, losses)
+                rate = done / (time.perf_counter() - start) * 60
+                print(f'{done}/{args.games} games: +{wins} ={draws} -{losses}, elo {difference:+.1f} ± {error:.1f}, {rate:.1f} games/min')
+    if writer: writer.close()
+
+    for index, (games, nodes, seconds) in enumerate(workers.values()):
+        print(f'worker {index}: {games} games, {games / seconds * 60:.1f} games/min, {nodes / seconds:,.0f} nodes/s')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
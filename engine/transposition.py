@@ -0,0 +1,90 @@
+"""Transposition table of packed 64 bit entries in a preallocated buffer"""
+
+from array import array
+
+# BOUNDS, AN EMPTY SLOT IS ALL ZEROS
+EXACT, LOWER, UPPER = 1, 2, 3
+
+# ENTRY BITS: MOVE 0-15, SCORE 16-31, DEPTH 32-39, BOUND 40-41, AGE 42-47, KEY CHECK 48-63
+SCORE_OFFSET = 1 << 15
+MAX_DEPTH = 255
+AGES = 64
+
+# BUCKETS SAMPLED TO ESTIMATE THE FILL
+FILL_SAMPLE = 1000
+
+
+def words(megabytes: int) -> int:
+    """Returns the 64 bit words of the largest power of two table that fits the memory"""
+    buckets = max(megabytes * 2**20 // 16, 1)
+    return 2 << (buckets.bit_length() - 1)
+
+
+class TranspositionTable:
+    """Buckets of a depth preferred slot and an always replace slot"""
+    def __init__(self, megabytes: int=64, buffer=None):
+
+        # THE BUFFER IS ANY SEQUENCE OF UNSIGNED 64 BIT WORDS, LIKE SHARED MEMORY CAST TO 'Q'
+        self.table = buffer if buffer is not None else array('Q', [0]) * words(megabytes)
+        self.mask = len(self.table) // 2 - 1
+        self.age = 0
+
+        # STATISTICS
+        self.probes = 0
+        self.hits = 0
+        self.stores = 0
+
+    def clear(self) -> None:
+        """Empties every slot"""
+        self.table[:] = array('Q', [0]) * len(self.table)
+        self.age = 0
+
+    def new_search(self) -> None:
+        """Ages the entries so the next search replaces them first"""
+        self.age = (self.age + 1) % AGES
+        self.probes = self.hits = self.stores = 0
+
+    def probe(self, key: int) -> tuple[int, int, int, int] | None:
+        """Returns the move, score, depth and bound stored for the key"""
+        self.probes += 1
+        index = (key & self.mask) << 1
+        check = key >> 48
+        entry = self.table[index]
+        if not entry or entry >> 48 != check:
+            entry = self.table[index + 1]
+            if not entry or entry >> 48 != check: return None
+        self.hits += 1
+        return entry & 0xFFFF, ((entry >> 16) & 0xFFFF) - SCORE_OFFSET, (entry >> 32) & 0xFF, (entry >> 40) & 3
+
+    def store(self, key: int, depth: int, bound: int, score: int, move: int) -> None:
+        """Saves a result, the first slot keeps the deepest entry of the current search"""
+        self.stores += 1
+        table = self.table
+        index = (key & self.mask) << 1
+        check = key >> 48
+        first = table[index]
+        same = first >> 48 == check
+
+        # AN ENTRY WITHOUT MOVE KEEPS THE MOVE ALREADY KNOWN FOR THE SAME POSITION
+        if not move and same: move = first & 0xFFFF
+        depth = min(max(depth, 0), MAX_DEPTH)
+        entry = move | ((score + SCORE_OFFSET) << 16) | (depth << 32) | (bound << 40) | (self.age << 42) | (check << 48)
+
+        if not first or same or (first >> 42) & 63 != self.age or depth >= (first >> 32) & 0xFF: table[index] = entry
+        else: table[index + 1] = entry
+
+    @property
+    def hit_rate(self) -> float:
+        """Returns the fraction of probes that found their position"""
+        return self.hits / self.probes if self.probes else 0
+
+    def fill(self) -> int:
+        """Returns the permille of sampled slots used by the current search"""
+        slots = min(FILL_SAMPLE, self.mask + 1) * 2
+        used = sum(1 for entry in self.table[:slots] if entry and (entry >> 42) & 63 == self.age)
+        return used * 1000 // slots
+
+    def report(self) -> str:
+        """Returns the size, hit rate and fill of the table"""
+        megabytes = len(self.table) * 8 / 2**20
+        return f'{megabytes:.0f} MB, {self.hit_rate:.1%} hits of {self.probes} probes, {self.fill()/10:.1f}% full'
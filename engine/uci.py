@@ -0,0 +1,207 @@
+"""UCI protocol over stdin and stdout with the rules and search of the engine, no pygame needed
+
+    python -m engine.uci                    speaks UCI, for tournament managers and analysis tools
+    python -m engine.uci --hash 256         starts with a bigger transposition table
+
+    Commands: uci, isready, ucinewgame, setoption (Hash, Book, Tablebases, Ponder), position, go, stop, ponderhit, quit
+    The search runs in its own thread so reading commands never waits for it and stop is answered at once
+    An infinite or pondering search keeps its best move until stop or ponderhit, as the protocol asks
+"""
+
+import sys
+import argparse
+import threading
+from engine import book
+from engine import moves
+from engine import tablebase
+from engine.position import Position, START_FEN
+from engine.search import Search, MAX_PLY
+from engine.transposition import TranspositionTable
+
+# IDENTITY
+NAME = 'Star Chess'
+AUTHOR = 'TheCodingStudent'
+
+# TIME CONTROL, MOVES EXPECTED UNTIL THE NEXT CONTROL AND SECONDS KEPT FOR THE PIPES
+MOVES_TO_GO = 30
+OVERHEAD = 0.05
+
+# HASH SIZES ADVERTISED, IN MEGABYTES
+MIN_HASH = 1
+MAX_HASH = 4096
+
+# GO ARGUMENTS THAT TAKE A NUMBER
+GO_NUMBERS = ('depth', 'movetime', 'nodes', 'wtime', 'btime', 'winc', 'binc', 'movestogo')
+
+
+def parse_move(position: Position, text: str) -> int:
+    """Returns the legal move written in coordinate notation, raises ValueError if there is none"""
+    for move in position.legal_moves():
+        if moves.name(move) == text.lower(): return move
+    raise ValueError(f'illegal move {text}')
+
+
+def parse_position(tokens: list[str]) -> Position:
+    """Returns the position of the arguments of a position command, the moves are played on it"""
+    if tokens and tokens[0] == 'fen':
+        end = tokens.index('moves') if 'moves' in tokens else len(tokens)
+        position = Position(' '.join(tokens[1:end]))
+    else: position = Position(START_FEN)
+    if 'moves' in tokens:
+        for text in tokens[tokens.index('moves') + 1:]: position.make(parse_move(position, text))
+    return position
+
+
+def parse_go(tokens: list[str]) -> dict:
+    """Returns the limits of the arguments of a go command"""
+    limits = {'infinite': 'infinite' in tokens, 'ponder': 'ponder' in tokens}
+    for name, value in zip(tokens, tokens[1:]):
+        if name in GO_NUMBERS: limits[name] = int(value)
+    return limits
+
+
+def time_limit(limits: dict, turn: int) -> float | None:
+    """Returns the seconds to think, a share of the clock plus most of the increment"""
+    if 'movetime' in limits: return max(limits['movetime'] / 1000 - OVERHEAD, 0.01)
+    clock, increment = ('wtime', 'winc') if turn == 0 else ('btime', 'binc')
+    if clock not in limits: return None
+    remaining = limits[clock] / 1000
+    share = remaining / limits.get('movestogo', MOVES_TO_GO) + limits.get(increment, 0) / 1000 * 0.75
+    return max(min(share, remaining / 2) - OVERHEAD, 0.01)
+
+
+class UCI:
+    """Engine side of the protocol, one search thread at a time"""
+    def __init__(self, megabytes: int=64, output=sys.stdout):
+        self.output = output
+        self.lock = threading.Lock()
+        self.megabytes = megabytes
+        self.search = Search(TranspositionTable(megabytes))
+        self.search.stop_event = threading.Event()
+        self.search.info = lambda search: self.send(f'info {search.report()}')
+        self.search.book = book.load()
+        self.search.tablebase = tablebase.load()
+        self.position = Position(START_FEN)
+        self.thread = None
+
+        # LIMITS OF THE RUNNING SEARCH AND THE EVENT THAT LETS IT ANSWER, SET AT ONCE UNLESS IT IS INFINITE OR PONDERING
+        self.limits = dict()
+        self.release = threading.Event()
+        self.timer = None
+
+    def send(self, line: str) -> None:
+        """Writes a line to the interface, from any thread"""
+        with self.lock:
+            self.output.write(line + '\n')
+            self.output.flush()
+
+    # COMMANDS
+    def handle(self, line: str) -> bool:
+        """Runs one command line, returns False once the engine has to quit"""
+        if not (tokens := line.split()): return True
+        command, arguments = tokens[0], tokens[1:]
+        if command == 'quit':
+            self.stop()
+            return False
+
+        if command == 'uci':
+            self.send(f'id name {NAME}')
+            self.send(f'id author {AUTHOR}')
+            self.send(f'option name Hash type spin default {self.megabytes} min {MIN_HASH} max {MAX_HASH}')
+            self.send('option name Ponder type check default false')
+            self.send(f'option name Book type string default {book.BOOK_PATH}')
+            self.send(f'option name Tablebases type string default {tablebase.TABLEBASE_PATH}')
+            self.send('uciok')
+        elif command == 'isready': self.send('readyok')
+        elif command == 'ucinewgame':
+            self.stop()
+            self.search.tt.clear()
+            self.search.history = [[0]*4096, [0]*4096]
+        elif command == 'setoption': self.set_option(arguments)
+        elif command == 'position':
+            self.stop()
+            self.position = parse_position(arguments)
+        elif command == 'go': self.go(parse_go(arguments))
+        elif command == 'stop': self.stop()
+        elif command == 'ponderhit': self.ponderhit()
+        else: self.send(f'info string unknown command {command}')
+        return True
+
+    def set_option(self, tokens: list[str]) -> None:
+        """Changes the hash size, the book or the tables"""
+        if 'name' not in tokens: return
+        value_at = tokens.index('value') if 'value' in tokens else len(tokens)
+        name = ' '.join(tokens[tokens.index('name') + 1:value_at]).lower()
+        value = ' '.join(tokens[value_at + 1:])
+        self.stop()
+        if name == 'hash':
+            self.megabytes = max(MIN_HASH, min(MAX_HASH, int(value)))
+            self.search.tt = TranspositionTable(self.megabytes)
+        elif name == 'book': self.search.book = book.load(value) if value else None
+        elif name == 'tablebases': self.search.tablebase = tablebase.load(value) if value else None
+        elif name == 'ponder': return
+        else: self.send(f'info string unknown option {name}')
+
+    def go(self, limits: dict) -> None:
+        """Starts searching the position in the background, it is back as it was once the search ends"""
+        self.stop()
+        self.search.stop_event.clear()
+        self.limits = limits
+        if limits['infinite'] or limits['ponder']: self.release.clear()
+        else: self.release.set()
+
+        # PONDERING THINKS WITHOUT A CLOCK UNTIL PONDERHIT STARTS IT
+        seconds = None if limits['infinite'] or limits['ponder'] else time_limit(limits, self.position.turn)
+        args = (self.position, seconds, limits.get('depth', MAX_PLY), limits.get('nodes'))
+        self.thread = threading.Thread(target=self.think, args=args, daemon=True)
+        self.thread.start()
+
+    def think(self, position: Position, seconds: float | None, depth: int, nodes: int | None) -> None:
+        """Body of the search thread, ends with the best move once the search is released"""
+        move = self.search.think(position, seconds, depth, nodes)
+        self.release.wait()
+        if not move: return self.send('bestmove 0000')
+        pv = self.search.pv
+        ponder = f' ponder {moves.name(pv[1])}' if len(pv) > 1 and pv[0] == move else ''
+        self.send(f'bestmove {moves.name(move)}{ponder}')
+
+    def ponderhit(self) -> None:
+        """The opponent played the move pondered, the search goes on with the clock of the move from now"""
+        if not self.thread or not self.limits.get('ponder'): return
+        self.limits['ponder'] = False
+        if self.limits['infinite']: return
+        if (seconds := time_limit(self.limits, self.position.turn)) is not None:
+            self.timer = threading.Timer(seconds, self.search.stop_event.set)
+            self.timer.start()
+        self.release.set()
+
+    def stop(self) -> None:
+        """Stops the running search and waits for its best move"""
+        if not self.thread: return
+        self.search.stop_event.set()
+        self.release.set()
+        self.thread.join()
+        self.thread = None
+        if self.timer: self.timer.cancel()
+        self.timer = None
+
+    def loop(self, lines) -> None:
+        """Answers every line as it arrives until quit or the end of the input, a wrong line only gets a message"""
+        for line in lines:
+            try:
+                if not self.handle(line): return
+            except (ValueError, IndexError) as error: self.send(f'info string {error}')
+        self.stop()
+
+
+def main(argv: list[str]=None) -> int:
+    """Speaks UCI until quit, returns the exit code"""
+    parser = argparse.ArgumentParser(prog='python -m engine.uci', description='UCI engine of Star Chess')
+    parser.add_argument('--hash', type=int, default=64, help='megabytes of the transposition table')
+    args = parser.parse_args(argv)
+    UCI(args.hash).loop(sys.stdin)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,98 @@
+"""Engine searching in a background process that the game loop polls without blocking"""
+
+import multiprocessing
+from engine import book
+from engine import tablebase
+from engine.position import Position
+from engine.search import Search
+from engine.transposition import TranspositionTable
+
+# COMMANDS
+GO, PONDER, ANALYSE = 'go', 'ponder', 'analyse'
+
+
+def run(connection, stop_event, megabytes: int, book_path: str, tablebase_path: str) -> None:
+    """Loop of the engine process, answers every command until it receives None"""
+    search = Search(TranspositionTable(megabytes))
+    search.stop_event = stop_event
+    if book_path: search.book = book.load(book_path)
+    if tablebase_path: search.tablebase = tablebase.load(tablebase_path)
+    while (command := connection.recv()) is not None:
+        kind, fen, time_limit = command
+        if kind == ANALYSE:
+            scores = search.analyse(Position(fen), time_limit)
+            connection.send((kind, scores, search.depth))
+            continue
+        move = search.think(Position(fen), time_limit)
+        connection.send((kind, move, search.depth, search.nps, search.tt.hit_rate, search.pv))
+
+
+class EngineWorker:
+    """Keeps one search running at a time, a new command stops the running one first"""
+    def __init__(self, megabytes: int=64, book_path: str=None, tablebase_path: str=None):
+        self.connection, child = multiprocessing.Pipe()
+        self.stop_event = multiprocessing.Event()
+        args = (child, self.stop_event, megabytes, book_path, tablebase_path)
+        self.process = multiprocessing.Process(target=run, args=args, daemon=True)
+        self.process.start()
+
+        # STATE, THE RUNNING COMMAND IS NONE ONCE ITS RESULT IS NOT WANTED
+        self.busy = False
+        self.running = None
+        self.pending = None
+
+    @property
+    def thinking(self) -> bool:
+        """Checks if a move search is running or waiting to run"""
+        return GO in (self.running, self.pending and self.pending[0])
+
+    def go(self, fen: str, time_limit: float) -> None:
+        """Searches the best move of the position, poll returns it"""
+        self.send((GO, fen, time_limit))
+
+    def ponder(self, fen: str) -> None:
+        """Searches the position until the next command, filling the table for later"""
+        self.send((PONDER, fen, None))
+
+    def analyse(self, fen: str, time_limit: float) -> None:
+        """Scores every legal move of the position, poll returns them"""
+        self.send((ANALYSE, fen, time_limit))
+
+    def send(self, command: tuple) -> None:
+        """Starts the command, or stops the running search and leaves it pending"""
+        if self.busy:
+            self.pending = command
+            self.running = None
+            self.stop_event.set()
+            return
+        self.stop_event.clear()
+        self.connection.send(command)
+        self.busy = True
+        self.running = command[0]
+
+    def stop(self) -> None:
+        """Cancels the running search and any pending one"""
+        self.pending = None
+        self.running = None
+        if self.busy: self.stop_event.set()
+
+    def poll(self) -> tuple | None:
+        """Returns the move, depth, speed, hit rate and pv of a finished move search, or the scores and depth of an analysis, never blocks"""
+        result = None
+        while self.busy and self.connection.poll():
+            kind, *data = self.connection.recv()
+            if kind in (GO, ANALYSE) and self.running == kind: result = data
+            self.busy = False
+            self.running = None
+            if self.pending:
+                command, self.pending = self.pending, None
+                self.send(command)
+        return result
+
+    def close(self) -> None:
+        """Stops the search and ends the process"""
+        self.stop()
+        if not self.process.is_alive(): return
+        self.connection.send(None)
+        self.process.join(1)
+        if self.process.is_alive(): self.process.terminate()
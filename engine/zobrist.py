@@ -0,0 +1,14 @@
+"""Random 64 bit keys to hash positions incrementally"""
+
+import random
+
+# A FIXED SEED KEEPS THE KEYS EQUAL BETWEEN RUNS, FILES AND CLIENTS
+_random = random.Random(20230710)
+
+PIECES = [[[_random.getrandbits(64) for sq in range(64)] for kind in range(6)] for team in range(2)]
+CASTLING = [_random.getrandbits(64) for rights in range(16)]
+EN_PASSANT = [_random.getrandbits(64) for file in range(8)]
+SIDE = _random.getrandbits(64)
+
+# CASTLING RIGHTS AS BITS
+WHITE_RIGHT, WHITE_LEFT, BLACK_RIGHT, BLACK_LEFT = 1, 2, 4, 8
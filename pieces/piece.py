@@ -1,12 +1,20 @@
 import os
 import math
 import pygame
+from engine import moves
+from engine import bitboard
 from scripts import functions
 from settings.settings import *
 from screen.resolution import ResolutionScreen
 
+# FONTS, IMAGES AND NAMES SHARED BY EVERY PIECE, LOADED ONCE PER FILE AND SCREEN SIZE
+ASSETS = dict()
+
+
 class Piece:
     """Base class for all pieces"""
+    kind: int = None
+
     def __init__(self, board, screen: pygame.Surface, path: str, image: str, x: int, y: int, team: str, name: str):
 
         # BOARD
@@ -18,30 +26,29 @@ class Piece:
         # PIECE PROPERTIES
         self.team = team
         self.enemy = 'black' if team=='white' else 'white'
-        self.moved = False
+        self.side = bitboard.WHITE if team=='white' else bitboard.BLACK
         self.hovered = False
         self.blocked = False
         self.selected = False
         self.x, self.y = x, y
+        self.legal_moves: list[int] = list()
         self.possible_moves: list[pygame.Vector2] = list()
         self.possible_moves_rects: list[pygame.Rect] = list()
 
         # FONT
         self.path = os.path.dirname(path)
         font_path = functions.resource_path(f'{self.path}/font/pixel.ttf')
-        self.font = pygame.font.Font(font_path, int(self.screen.convert(48)))
+        self.font = self.asset(font_path, lambda: pygame.font.Font(font_path, int(self.screen.convert(48))))
 
         # NAME
-        self.name = self.font.render(name, True, 'white')
-        self.name_background = pygame.Surface(self.name.get_size())
-        self.name_background.fill('black')
-        self.name_background.set_alpha(127)
+        self.name = self.asset(name, lambda: self.font.render(name, True, 'white'))
+        self.name_background = self.asset((name, 'background'), self.get_name_background)
         self.get_name_rect()
 
         # IMAGE
         self.path = os.path.dirname(path)
         image_path = functions.resource_path(f'{self.path}/images/redesign/{image}.png')
-        self.image = self.screen.load_image(image_path, color_key='white', scale=4.5)
+        self.image = self.asset(image_path, lambda: self.screen.load_image(image_path, color_key='white', scale=4.5))
 
         # COLORS
         self.color = RED if team=='black' else BLUE
@@ -63,21 +70,27 @@ class Piece:
             function=self.select_color.set_alpha
         )
 
-        # FLAGS
-        self.flag = None
+    def asset(self, key: object, load) -> object:
+        """Returns the asset of the key for this screen size, loading it the first time"""
+        key = (key, self.screen.ratio)
+        if key not in ASSETS: ASSETS[key] = load()
+        return ASSETS[key]
+
+    def get_name_background(self) -> pygame.Surface:
+        """Creates the translucent box behind the name"""
+        background = pygame.Surface(self.name.get_size())
+        background.fill('black')
+        background.set_alpha(127)
+        return background
+
+    @property
+    def square(self) -> int:
+        """Returns the bitboard index of the piece"""
+        return bitboard.square(self.x, self.y)
 
     def reset(self) -> None:
         self.blocked = False
 
-    def check_flag(self) -> None:
-        """Applies the function marked as flag"""
-        if not self.flag: return
-        self.flag = self.flag()
-    
-    def update_next_turn(self, variable: str, value: object) -> None:
-        """Changes an attribute the next turn"""
-        self.flag = lambda: setattr(self, variable, value)
-
     def get_name_rect(self) -> None:
         """Gets the position of the name"""
         centerx = self.screen.convert(((self.x+0.5)*SQUARE + LEFT))
@@ -92,11 +105,6 @@ class Piece:
         """Returns if the mouse collides with its rect"""
         return self.rect.collidepoint(pos)
 
-    def is_enemy(self, pos: tuple[int, int]) -> bool:
-        """Checks if there is an enemy at the given position"""
-        if not (piece := self.board.get(pos)): return False
-        return piece.team != self.team
-
     def get_rect(self, x: int, y: int) -> pygame.Rect:
         """Gets the rect to position the piece"""
         left = math.ceil(self.screen.convert(x*SQUARE+LEFT))
@@ -104,20 +112,21 @@ class Piece:
         return self.move_color.get_rect(topleft=(left, top))
 
     def move(self, pos: tuple[int, int]) -> None:
-        """Moves the piece and updates itself and the board"""
+        """Moves the piece and updates its rects, the board plays the sounds"""
         self.x, self.y = pos
         self.get_name_rect()
         self.rect = self.get_rect(self.x, self.y)
         self.selected = False
-        if not self.moved: self.moved = True
 
         # CENTER PIECE
         centerx = ((self.x+0.5)*SQUARE+LEFT) * self.screen.ratio
         bottom = ((self.y+1)*SQUARE+TOP) * self.screen.ratio
         self.image_rect = self.image.get_rect(centerx=centerx, bottom=bottom)
 
-        # PLAY MOVE SOUND
-        self.board.mixer.play_sound('move.wav')
+    def get_move(self, pos: tuple[int, int]) -> int:
+        """Returns the legal move that reaches the given position"""
+        end = bitboard.square(*pos)
+        return next(move for move in self.legal_moves if moves.end(move) == end)
 
     def click(self, event: pygame.event) -> None:
         """Updates the piece if it was selected"""
@@ -159,68 +168,25 @@ class Piece:
 
     def calculate_moves_rects(self) -> None:
         """Updates the collision rects for each possible move"""
-        self.possible_moves_rects.clear()
         self.possible_moves_rects = [
             self.get_rect(*move)
             for move in self.possible_moves
         ]
     
-    def available(self, pos: tuple[int, int]) -> bool:
-        """Checks if the given position if available on the board"""
-        return self.board.available(pos)
-
-    def is_legal(self, move: tuple[int, int]) -> bool:
-        """Checks if the given move is legal"""
-
-        # BOARD
-        board = self.board.board
-        capture_piece = None
-
-        # KING PROPERTIES
-        king = getattr(self.board, f'{self.team}_king')
-        x0, y0 = self.x, self.y
-        x1, y1 = move
-
-        # CHECK IF CAPTURING MOVE
-        if not self.available(move):
-            capture_piece = board[y1][x1]
-            enemy_pieces = getattr(self.board, f'{self.enemy}_pieces')
-            enemy_pieces.remove(capture_piece)
-            board[y1][x1] = None
-
-        # SIMULATE MOVE AND ENEMY POSSIBLE MOVES
-        self.x, self.y = move
-        board[y0][x0], board[y1][x1] = board[y1][x1], board[y0][x0]
-        enemy_moves = getattr(self.board, f'get_{self.enemy}_moves')(check_legal=False)
-        self.x, self.y = x0, y0
-        board[y0][x0], board[y1][x1] = board[y1][x1], board[y0][x0]
-
-        # REVERSE CAPTURE
-        if capture_piece:
-            board[y1][x1] = capture_piece
-            enemy_pieces = getattr(self.board, f'{self.enemy}_pieces')
-            enemy_pieces.append(capture_piece)
-
-        # RETURN IF THE KING IS SAFE AFTER THE MOVE
-        return not ((king.x, king.y) in enemy_moves)
-
-    def check_legal(self) -> None:
-        """Filters the illegal moves"""
-        if not self.possible_moves: return
-        self.possible_moves = [move for move in self.possible_moves.copy() if self.is_legal(move)]
-        self.blocked = len(self.possible_moves) == 0
+    def set_moves(self, legal_moves: list[int]) -> None:
+        """Takes the legal moves of the piece from the rules engine"""
+        self.legal_moves = legal_moves
+        ends = dict.fromkeys(moves.end(move) for move in legal_moves)
+        self.possible_moves = [(end & 7, end >> 3) for end in ends]
         self.calculate_moves_rects()
 
-    def check_moves(self, moves: list[tuple[int, int]]) -> None:
-        """Checks if the given list of moves is legal"""
-        for move in moves:
-            if self.available(move): self.possible_moves.append(move)
-            elif self.is_enemy(move): return self.possible_moves.append(move)
-            else: return
-    
-    def in_attack(self, pos: tuple[int, int]) -> bool:
-        """Checks if the given position is attack by the enemy"""
-        return self.board.in_attack(pos)
+    def save_moves(self) -> tuple:
+        """Returns the legal moves to cache them, the lists are never mutated"""
+        return self.legal_moves, self.possible_moves, self.possible_moves_rects, self.blocked
+
+    def load_moves(self, state: tuple) -> None:
+        """Restores the legal moves saved for the same position"""
+        self.legal_moves, self.possible_moves, self.possible_moves_rects, self.blocked = state
 
     def __repr__(self) -> None:
         return f'(({self.x}, {self.y}), {self.team})'
\ No newline at end of file
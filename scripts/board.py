@@ -2,6 +2,16 @@ import os
 import pygame
 from screen import ui
 from web import client
+from engine import book
+from engine import pgn
+from engine import archive
+from engine import moves
+from engine import tablebase
+from engine import bitboard
+from engine.attacks import AttackMap
+from engine.worker import EngineWorker
+from engine.incremental import MoveGenerator
+from engine.position import Position, ROOK_CASTLING, START_FEN
 from scripts import functions
 from audio.mixer import Mixer
 from settings.settings import *
@@ -14,8 +24,19 @@ from pieces.queen import Queen
 from pieces.knight import Knight
 from pieces.bishop import Bishop
 
+PIECES = {
+    bitboard.PAWN: Pawn,
+    bitboard.KNIGHT: Knight,
+    bitboard.BISHOP: Bishop,
+    bitboard.ROOK: Rook,
+    bitboard.QUEEN: Queen,
+    bitboard.KING: King,
+}
 
 class Board:
+    # PGN SITE OF THE GAMES PLAYED ON THE BOARD
+    site = 'local'
+
     def __init__(self, screen: pygame.Surface, mixer: Mixer, path: str):
         # SCREEN CONFIGURATION
         self.path = path
@@ -34,12 +55,37 @@ class Board:
         # FONT
         font_path = functions.resource_path(f'{os.path.dirname(path)}/font/pixel.ttf')
         self.font = pygame.font.Font(font_path, int(self.screen.convert(96)))
+        self.info_font = pygame.font.Font(font_path, int(self.screen.convert(32)))
 
         # CLOCK
         self.clock = pygame.time.Clock()
         self.fps = 144
         self.dt = 0
 
+        # LEGAL MOVES OF THE LAST POSITIONS SEEN, BY ZOBRIST KEY
+        self.moves_cache = functions.LRUCache(512)
+
+        # OPENING BOOK, ITS HINT IS TOGGLED WITH B
+        self.book_path = functions.resource_path(f'{os.path.dirname(path)}/{ENGINE_BOOK}')
+        self.book = book.load(self.book_path)
+        self.show_book = False
+
+        # ENDGAME TABLES, THE RESULT OF THE POSITION IS TOGGLED WITH T
+        self.tablebase_path = functions.resource_path(f'{os.path.dirname(path)}/{ENGINE_TABLEBASES}')
+        self.tablebase = tablebase.load(self.tablebase_path)
+        self.show_result = False
+
+        # GAMES ARE SAVED WHEN THE BOARD RESETS OR CLOSES, THE UNFINISHED ONES ONLY TO THE ARCHIVE
+        self.pgn_path = functions.resource_path(f'{os.path.dirname(path)}/{GAMES_PGN}')
+        self.archive_path = functions.resource_path(f'{os.path.dirname(path)}/{GAMES_ARCHIVE}')
+        self.saved = True
+
+        # ANALYSIS, TOGGLED WITH A, SCORES EVERY MOVE IN ITS OWN PROCESS ONCE PER POSITION
+        self.analysis = False
+        self.analyst = None
+        self.analysing = None
+        self.analysis_cache = functions.LRUCache(512)
+
         # ANIMATIONS
         self.turn_anim = functions.DeltaValue(duration=2000, min_value=0, max_value=1)
         self.confeti = ui.Confeti(screen)
@@ -64,76 +110,93 @@ class Board:
         """Marks the running flag to exit the board"""
         self.running = False
 
-    def reset(self) -> None:
-        """Resets the board to its initial state"""
+    def reset(self, fen: str=START_FEN) -> None:
+        """Resets the board to the position of the FEN string, the initial one by default"""
+        position = Position(fen)
+        if position.king(bitboard.WHITE) < 0 or position.king(bitboard.BLACK) < 0: raise ValueError(f'{fen} needs both kings')
+        self.save_game()
         screen = self.screen.screen
         self.running = True
+        self.start_fen = fen
+
+        # RULES, THE PIECES ARE ONLY THE SPRITES OF THE POSITION
+        self.position = position
+        self.attack_map = AttackMap(self.position.bitboards)
+        self.position.attack_map = self.attack_map
+        self.generator = MoveGenerator(self.position, CHECK_MOVES)
 
         # BOARD
-        self.board = [
-            [None, None, None, None, None, None, None, None],
-            [Pawn(self, screen, self.path, x, 1, 'black') for x in range(8)],
-            [None, None, None, None, None, None, None, None],
-            [None, None, None, None, None, None, None, None],
-            [None, None, None, None, None, None, None, None],
-            [None, None, None, None, None, None, None, None],
-            # [None, None, None, None, None, None, None, None],
-            [Pawn(self, screen, self.path, x, 6, 'white') for x in range(8)],
-            [None, None, None, None, None, None, None, None],
-        ]
+        self.board = [[None]*8 for _ in range(8)]
+        for sq in range(64):
+            if not (piece := self.position.piece_at(sq)): continue
+            team, kind = piece
+            x, y = sq & 7, sq >> 3
+            self.board[y][x] = PIECES[kind](self, screen, self.path, x, y, bitboard.TEAMS[team])
 
         # PIECES
-        self.board[0][0] = Rook(self, screen, self.path, 0, 0, 'black')
-        self.board[0][7] = Rook(self, screen, self.path, 7, 0, 'black')
-        self.board[7][0] = Rook(self, screen, self.path, 0, 7, 'white')
-        self.board[7][7] = Rook(self, screen, self.path, 7, 7, 'white')
-
-        self.board[0][1] = Knight(self, screen, self.path, 1, 0, 'black')
-        self.board[0][6] = Knight(self, screen, self.path, 6, 0, 'black')
-        self.board[7][1] = Knight(self, screen, self.path, 1, 7, 'white')
-        self.board[7][6] = Knight(self, screen, self.path, 6, 7, 'white')
-        
-        self.board[0][2] = Bishop(self, screen, self.path, 2, 0, 'black')
-        self.board[0][5] = Bishop(self, screen, self.path, 5, 0, 'black')
-        self.board[7][2] = Bishop(self, screen, self.path, 2, 7, 'white')
-        self.board[7][5] = Bishop(self, screen, self.path, 5, 7, 'white')
-
-        self.board[0][3] = Queen(self, screen, self.path, 3, 0, 'black')
-        self.board[7][3] = Queen(self, screen, self.path, 3, 7, 'white')
-
-        self.board[0][4] = King(self, screen, self.path, 4, 0, 'black')
-        self.board[7][4] = King(self, screen, self.path, 4, 7, 'white')
-
-        self.black_king = self.board[0][4]
-        self.white_king = self.board[7][4]
-
         self.white_pieces = [piece for row in self.board for piece in row if piece and piece.team == 'white']
         self.black_pieces = [piece for row in self.board for piece in row if piece and piece.team == 'black']
         self.all_pieces = self.white_pieces + self.black_pieces
+        self.white_king = next(piece for piece in self.white_pieces if isinstance(piece, King))
+        self.black_king = next(piece for piece in self.black_pieces if isinstance(piece, King))
 
         # PROPERTIES
         self.selected = None
-        self.current = 'white'
-        self.white_move_color = self.board[0][0].alpha_rect(BLUE, 0.2)
-        self.black_move_color = self.board[0][0].alpha_rect(RED, 0.2)
-        self.white_moves_rects = list()
-        self.black_moves_rects = list()
+        self.white_move_color = self.all_pieces[0].alpha_rect(BLUE, 0.2)
+        self.black_move_color = self.all_pieces[0].alpha_rect(RED, 0.2)
+        self.book_color = self.all_pieces[0].alpha_rect(GREEN, 0.4)
+        self.analysis_colors = [
+            self.all_pieces[0].alpha_rect(GREEN + (RED - GREEN) * (i / (ANALYSIS_COLORS-1)), 0.4)
+            for i in range(ANALYSIS_COLORS)
+        ]
+        self.legal_moves = list()
+        self.book_move = 0
+        self.result = None
+        self.analysing = None
+        if self.analyst: self.analyst.stop()
+
+        # HISTORY
+        self.history = list()
+        self.promotions = dict()
 
         # WINNER
         self.winner = None
         self.winner_rect = None
+        self.winning_team = None
+        self.saved = False
 
         # ANIMATIONS
         self.turn_anim.reset()
         self.confeti.reset()
 
+    def from_fen(self, fen: str) -> None:
+        """Sets up any position with its side to move, castling rights, en passant square and counters"""
+        self.reset(fen)
+        self.get_possible_moves()
+        if (winner := self.position.winner(self.legal_moves)) is not None:
+            self.win(bitboard.TEAMS[winner])
+
+    def to_fen(self) -> str:
+        """Returns the FEN string of the position on the board"""
+        return self.position.fen()
+
+    @property
+    def current(self) -> str:
+        """Returns the team to move"""
+        return bitboard.TEAMS[self.position.turn]
+
+    @property
+    def key(self) -> int:
+        """Returns the Zobrist key of the position"""
+        return self.position.key
+
     # HELPING METHODS
     def win(self, real_winner: str='') -> None:
         """Updates the winner"""
 
         # GET MESSAGE
-        if real_winner: winner = 'la republica' if real_winner=='white' else 'el imperio'
-        else: winner = 'la republica' if self.current=='white' else 'el imperio'
+        self.winning_team = real_winner or self.current
+        winner = 'la republica' if self.winning_team=='white' else 'el imperio'
         message = f'{winner} gana!'.upper()
 
         # GET TEXT AND SURFACES
@@ -146,70 +209,131 @@ class Board:
 
         self.mixer.play_sound('win.mp3')
 
+    def save_game(self) -> None:
+        """Appends the game to the archive once, and to the PGN file if it is finished"""
+        if self.saved or not self.position.history: return
+        self.saved = True
+        game_moves = [entry[0] for entry in self.position.history]
+        if not self.winner: result = '*'
+        else: result = '1-0' if self.winning_team == 'white' else '0-1'
+
+        with archive.ArchiveWriter(self.archive_path) as writer: writer.write(game_moves, result, self.start_fen)
+        if not self.winner: return
+        headers = {'Event': 'Star Chess', 'Site': self.site, 'White': 'La Republica', 'Black': 'El Imperio'}
+        with pgn.PGNWriter(self.pgn_path) as writer: writer.write(game_moves, result, headers, self.start_fen)
+
     def change_turn(self) -> None:
-        """Manages the logic of changing turn"""
-        last_turn = self.current
-        pieces = getattr(self, f'{self.current}_pieces')
+        """Manages the logic of changing turn once the move was made"""
+        last_turn = 'black' if self.current == 'white' else 'white'
+        pieces = getattr(self, f'{last_turn}_pieces')
         for piece in pieces: piece.reset()
 
-        self.current = 'black' if self.current == 'white' else 'white'
         self.turn_anim.reset()
         self.get_possible_moves()
-        if not getattr(self, f'{self.current}_moves_rects'):
-            self.win(last_turn)
+        if (winner := self.position.winner(self.legal_moves)) is not None:
+            self.win(bitboard.TEAMS[winner])
 
-    def kill(self, x: int, y: int) -> None:
-        """Removes the piece from the board and plays its sound"""
-        if not (piece := self.get((x, y))): return
+    def kill(self, x: int, y: int):
+        """Removes the piece from the board and returns it"""
+        if not (piece := self.get((x, y))): return None
         if piece in self.black_pieces: self.black_pieces.remove(piece)
         if piece in self.white_pieces: self.white_pieces.remove(piece)
         self.all_pieces.remove(piece)
         self.board[y][x] = None
-        self.mixer.play_sound('capture.wav')
-
-        # CHECK IF MATE
-        if isinstance(piece, King): self.win()
-
-    def get_white_moves(self, check_legal:bool=True) -> list:
-        moves = list()
-        for white_piece in self.white_pieces:
-            white_piece.calculate_moves()
-            if check_legal: white_piece.check_legal()
-            moves.extend(white_piece.possible_moves)
-        return moves
-    
-    def get_black_moves(self, check_legal: bool=True) -> list:
-        moves = list()
-        for black_piece in self.black_pieces:
-            black_piece.calculate_moves()
-            if check_legal: black_piece.check_legal()
-            moves.extend(black_piece.possible_moves)
-        return moves
+        return piece
 
-    def get_possible_moves(self) -> None:
-        self.white_moves_rects.clear()
-        self.get_white_moves()
-        for white_piece in self.white_pieces:
-            self.white_moves_rects.extend(white_piece.possible_moves_rects)
-        
-        self.black_moves_rects.clear()
-        self.get_black_moves()
-        for black_piece in self.black_pieces:
-            self.black_moves_rects.extend(black_piece.possible_moves_rects)
+    def put(self, piece) -> None:
+        """Places a removed piece back on its square"""
+        getattr(self, f'{piece.team}_pieces').append(piece)
+        self.all_pieces.append(piece)
+        self.board[piece.y][piece.x] = piece
 
-        self.white_king.in_check = self.white_king.rect in self.black_moves_rects
-        self.black_king.in_check = self.black_king.rect in self.white_moves_rects
+    def get_possible_moves(self) -> None:
+        """Hands the legal moves of the side to move to its pieces"""
+        self.book_move = self.book.best(self.key) if self.book else 0
+        self.update_result()
+
+        # THE SIDE THAT JUST MOVED CANNOT BE IN CHECK
+        enemy = 'black' if self.current == 'white' else 'white'
+        getattr(self, f'{enemy}_king').in_check = False
+
+        # POSITIONS ALREADY SEEN DO NOT GENERATE AGAIN
+        if cached := self.moves_cache.get(self.key): return self.load_moves(cached)
+
+        king = getattr(self, f'{self.current}_king')
+        king.in_check = self.position.in_check()
+        self.legal_moves = self.generator.legal_moves()
+
+        # EACH PIECE GETS THE MOVES THAT START ON ITS SQUARE
+        piece_moves = dict()
+        for move in self.legal_moves: piece_moves.setdefault(moves.start(move), list()).append(move)
+        for piece in getattr(self, f'{self.current}_pieces'):
+            piece.set_moves(piece_moves.get(piece.square, list()))
+            piece.blocked = king.in_check and not piece.legal_moves
+
+        self.moves_cache.put(self.key, self.save_moves())
+
+    def update_result(self) -> None:
+        """Renders the result of the position when the endgame tables know it"""
+        self.result = None
+        if not self.tablebase or not (result := self.tablebase.probe(self.position)): return
+        outcome, plies = result
+        if outcome == tablebase.DRAW: message = 'tablas'
+        else:
+            winner = self.current if outcome == tablebase.WIN else bitboard.TEAMS[1-self.position.turn]
+            message = f'{"la republica" if winner=="white" else "el imperio"} gana en {(plies+1)//2}'
+        self.result = self.info_font.render(message.upper(), True, 'white')
+        self.result_rect = self.result.get_rect(topright=(self.screen.width - self.screen.convert(20), self.screen.convert(20)))
+
+    def toggle_analysis(self) -> None:
+        """Turns the analysis on or off, its process starts the first time"""
+        self.analysis = not self.analysis
+        if self.analysis and not self.analyst: self.analyst = EngineWorker(ANALYSIS_HASH_MB, tablebase_path=self.tablebase_path)
+
+    def update_analysis(self) -> None:
+        """Stores the scores of a finished analysis and asks for the position once a piece is selected"""
+        if not self.analyst: return
+        if result := self.analyst.poll():
+            # A RESULT THAT ARRIVES AFTER A RESET HAS NO POSITION TO BELONG TO
+            scores, depth = result
+            if self.analysing is not None: self.analysis_cache.put(self.analysing, scores)
+            self.analysing = None
+
+        # ONLY ONE REQUEST PER POSITION, HOVERING OR SELECTING AGAIN READS THE CACHE
+        if not self.analysis or self.winner or not self.selected: return
+        if self.analysing == self.key or self.key in self.analysis_cache: return
+        self.analysing = self.key
+        self.analyst.analyse(self.position.fen(), ANALYSIS_SECONDS)
+
+    def show_analysis(self, piece) -> bool:
+        """Tints the moves of the selected piece from green to red by their score, False until they are scored"""
+        if not (self.analysis and piece.selected and (scores := self.analysis_cache.get(self.key))): return False
+        if not all(move in scores for move in piece.legal_moves): return False
+
+        # PROMOTIONS SHARE THEIR SQUARE, IT SHOWS THE BEST OF THEM
+        best = max(scores.values())
+        squares = dict()
+        for move in piece.legal_moves:
+            end = moves.end(move)
+            squares[end] = max(squares.get(end, scores[move]), scores[move])
+        for end, score in squares.items():
+            level = min(best - score, ANALYSIS_RANGE) * (ANALYSIS_COLORS-1) // ANALYSIS_RANGE
+            self.screen.blit(self.analysis_colors[level], piece.get_rect(end & 7, end >> 3))
+        return True
 
-        for white_piece in self.white_pieces:
-            if not self.white_king.in_check: continue
-            if not white_piece.possible_moves: white_piece.blocked = True
+    def save_moves(self) -> tuple:
+        """Returns the legal moves of every piece to move indexed by its square"""
+        pieces = {piece.square: piece.save_moves() for piece in getattr(self, f'{self.current}_pieces')}
+        return getattr(self, f'{self.current}_king').in_check, self.legal_moves, pieces
 
-        for black_piece in self.black_pieces:
-            if not self.black_king.in_check: continue
-            if not black_piece.possible_moves: black_piece.blocked = True
+    def load_moves(self, cached: tuple) -> None:
+        """Restores the legal moves cached for the current position"""
+        in_check, self.legal_moves, pieces = cached
+        getattr(self, f'{self.current}_king').in_check = in_check
+        for piece in getattr(self, f'{self.current}_pieces'): piece.load_moves(pieces[piece.square])
 
     def move(self, x0: int, y0: int, x1: int, y1: int) -> None:
-        """Manages the logic of moving a piece"""
+        """Moves a piece to an empty square"""
         selected_piece = self.board[y0][x0]
         self.board[y0][x0], self.board[y1][x1] = self.board[y1][x1], self.board[y0][x0]
         selected_piece.move((x1, y1))
@@ -228,12 +352,13 @@ class Board:
         self.turn_anim.update(self.dt)
         for piece in self.all_pieces:
             piece.update(self.dt)
+        self.update_analysis()
         
         if self.winner: self.confeti.update(self.dt)
 
-    def in_attack(self, pos: tuple[int, int]) -> bool:
-        """Checks if the given position is in attack"""
-        ...
+    def in_attack(self, pos: tuple[int, int], team: int) -> bool:
+        """Checks if the given position is attacked by the team"""
+        return self.attack_map.attacked(bitboard.square(*pos), team)
 
     def in_bounds(self, pos: tuple[int, int]) -> bool:
         """Checks if the given position is legal"""
@@ -267,8 +392,13 @@ class Board:
         for black in self.black_pieces: black.show()
         current_pieces = getattr(self, f'{self.current}_pieces')
         for piece in current_pieces:
-            piece.show_moves()
+            if not self.show_analysis(piece): piece.show_moves()
             piece.show_name()
+
+        # MOST PLAYED BOOK MOVE
+        if self.show_book and not self.winner and self.book_move in self.legal_moves:
+            for sq in (moves.start(self.book_move), moves.end(self.book_move)):
+                self.screen.blit(self.book_color, self.all_pieces[0].get_rect(sq & 7, sq >> 3))
         
         # UPDATE TURN INDICATORS
         alpha = self.turn_anim.value
@@ -288,12 +418,14 @@ class Board:
 
         # UI
         self.exit_button.show()
+        if self.show_result and self.result: self.screen.blit(self.result, self.result_rect)
     
         # DEBUG
         # enemy = 'black' if self.current=='white' else 'white'
-        # rects = getattr(self, f'{enemy}_moves_rects')
+        # pieces = getattr(self, f'{enemy}_pieces')
         # color = getattr(self, f'{enemy}_move_color')
-        # for rect in rects: self.screen.blit(color, rect)
+        # for piece in pieces:
+        #     for rect in piece.possible_moves_rects: self.screen.blit(color, rect)
         
         # SHOW WINNER
         if not self.winner: return
@@ -301,9 +433,85 @@ class Board:
         self.screen.blit(self.winner, self.winner_rect)
         self.confeti.show()
     
-    def update_next_turn(self, x: int, y: int, attribute: str, value: object) -> None:
-        piece = self.board[y][x]
-        piece.update_next_turn(attribute, value)
+    def make(self, move: int):
+        """Plays a move on the position and mirrors it on the pieces, without sounds"""
+        start, end, flag = moves.start(move), moves.end(move), moves.flag(move)
+        x0, y0, x1, y1 = start & 7, start >> 3, end & 7, end >> 3
+        piece = self.board[y0][x0]
+        occupied = self.position.bitboards.occupied
+        self.position.make(move)
+
+        # CAPTURE, EN PASSANT TAKES THE PAWN BESIDE THE START
+        if flag == moves.EN_PASSANT: captured = self.kill(x1, y0)
+        else: captured = self.kill(x1, y1)
+        self.history.append((piece, captured))
+
+        # MOVE, CASTLING ALSO MOVES THE ROOK AND PROMOTION SWAPS THE PAWN
+        self.move(x0, y0, x1, y1)
+        if flag == moves.CASTLING:
+            rook_start, rook_end = ROOK_CASTLING[end]
+            self.move(rook_start & 7, rook_start >> 3, rook_end & 7, rook_end >> 3)
+        elif flag == moves.PROMOTION:
+            self.promote(piece, moves.promotion(move))
+
+        # THE DESTINATION CHANGES EVEN WHEN IT WAS ALREADY OCCUPIED
+        changed = (occupied ^ self.position.bitboards.occupied) | (1 << end)
+        self.attack_map.update(changed)
+        self.generator.update(changed)
+        return captured
+
+    def unmake(self) -> int:
+        """Takes back the last move made and returns it"""
+        occupied = self.position.bitboards.occupied
+        move = self.position.unmake()
+        piece, captured = self.history.pop()
+        start, end, flag = moves.start(move), moves.end(move), moves.flag(move)
+        x0, y0, x1, y1 = start & 7, start >> 3, end & 7, end >> 3
+
+        # MOVE BACK, UNDOING THE ROOK OF THE CASTLING OR THE PROMOTED PIECE
+        if flag == moves.PROMOTION:
+            self.kill(x1, y1)
+            self.put(piece)
+        elif flag == moves.CASTLING:
+            rook_start, rook_end = ROOK_CASTLING[end]
+            self.move(rook_end & 7, rook_end >> 3, rook_start & 7, rook_start >> 3)
+        self.move(x1, y1, x0, y0)
+
+        # RESTORE CAPTURE
+        if captured: self.put(captured)
+        changed = (occupied ^ self.position.bitboards.occupied) | (1 << end)
+        self.attack_map.update(changed)
+        self.generator.update(changed)
+        return move
+
+    def play(self, move: int) -> None:
+        """Plays a move with its sounds and changes the turn"""
+        captured = self.make(move)
+
+        # SOUNDS
+        if moves.flag(move) == moves.CASTLING: self.mixer.play_sound('castle.wav')
+        elif moves.flag(move) == moves.PROMOTION: self.mixer.play_sound('promote.wav')
+        elif captured: self.mixer.play_sound('capture.wav')
+        else: self.mixer.play_sound('move.wav')
+        self.change_turn()
+
+    def takeback(self) -> None:
+        """Undoes the last move played"""
+        if not self.history: return
+        if self.selected: self.selected.selected = False
+        self.selected = None
+        self.unmake()
+
+        # THE GAME GOES ON IF IT WAS OVER
+        self.winner = None
+        self.confeti.reset()
+        for piece in self.all_pieces: piece.reset()
+        self.turn_anim.reset()
+        self.get_possible_moves()
+
+    def ask_takeback(self) -> None:
+        """Takes back the last move, OnlineBoard asks the server instead"""
+        self.takeback()
 
     def click(self, event: pygame.event) -> None:
         """Manages all the logic when mouse is clicked"""
@@ -317,85 +525,13 @@ class Board:
         # GET ALL THE PIECES OF THE CURRENT PLAYER
         current_pieces = getattr(self, f'{self.current}_pieces')
 
-        # APPLY ANY FLAG
-        for piece in current_pieces:
-            piece.check_flag()
-
-        # CHECKS CLICK ON MOVE
+        # CHECKS CLICK ON MOVE, SPECIAL MOVES ARE ENCODED BY THE PIECE
         if self.selected:
-
-            # KING SPECIAL MOVES
-            if isinstance(self.selected, King):
-
-                # LEFT CASTLING
-                if self.selected.can_left_castling and self.selected.left_castling_rect.collidepoint(event.pos):
-                    x, y = self.selected.left_castling
-                    self.kill(x, y)
-                    self.move(self.selected.x, self.selected.y, x, y)
-                    x0, y0 = self.selected.left_rook
-                    x1, y1 = self.selected.left_rook_end
-                    self.move(x0, y0, x1, y1)
-                    self.change_turn()
-                    self.selected = None
-                    return self.mixer.play_sound('castle.wav')
-
-                # RIGHT CASTLING
-                elif self.selected.can_right_castling and self.selected.right_castling_rect.collidepoint(event.pos):
-                    x, y = self.selected.right_castling
-                    self.move(self.selected.x, self.selected.y, x, y)
-                    x0, y0 = self.selected.right_rook
-                    x1, y1 = self.selected.right_rook_end
-                    self.move(x0, y0, x1, y1)
-                    self.change_turn()
-                    self.selected = None
-                    return self.mixer.play_sound('castle.wav')
-            
-            elif isinstance(self.selected, Pawn):
-
-                # MOVED TWICE
-                if self.selected.double_move_rect.collidepoint(event.pos) and not self.selected.moved:
-                    self.selected.moved_twice = True
-                    x, y = self.selected.x, self.selected.y
-                    self.update_next_turn(x, y, "moved_twice", False)
-                    x0, y0 = self.selected.x, self.selected.y
-                    x1, y1 = self.selected.double_move
-                    self.move(x0, y0, x1, y1)
-                    self.change_turn()
-                    self.selected = None
-                    return
-
-                # LEFT EN PASSANT
-                elif self.selected.can_left_passant and self.selected.left_passant_rect.collidepoint(event.pos):
-                    x, y = self.selected.left_passant
-                    self.kill(x, y)
-                    x0, y0 = self.selected.x, self.selected.y
-                    x1, y1 = self.selected.left_passant_end
-                    self.move(x0, y0, x1, y1)
-                    self.change_turn()
-                    self.selected = None
-                    return
-
-                # RIGHT EN PASSANT
-                elif self.selected.can_right_passant and self.selected.right_passant_rect.collidepoint(event.pos):
-                    x, y = self.selected.right_passant
-                    self.kill(x, y)
-                    x0, y0 = self.selected.x, self.selected.y
-                    x1, y1 = self.selected.right_passant_end
-                    self.move(x0, y0, x1, y1)
-                    self.change_turn()
-                    self.selected = None
-                    return
-
-            # CHECKS EACH POSSIBLE MOVE AND IF IT WAS CLICKED
             for i, rect in enumerate(self.selected.possible_moves_rects):
                 if not rect.collidepoint(event.pos): continue
-                x0, y0 = self.selected.x, self.selected.y
-                x1, y1 = self.selected.possible_moves[i]
-                self.kill(x1, y1)
-                self.move(x0, y0, x1, y1)
-                self.change_turn()
+                move = self.selected.get_move(self.selected.possible_moves[i])
                 self.selected = None
-                return
+                return self.play(move)
             
             # IF NOT MOVE WAS SELECTED, THEN WE DESELECT THE PIECE
             self.selected.selected = False
@@ -406,15 +542,11 @@ class Board:
             if not piece.click(event): continue
             if piece.blocked: continue
             self.selected = piece
-            self.selected.calculate_moves()
-            return self.selected.check_legal()
+            return
 
     def main(self) -> None:
         """Main loop of the board"""
-
-        for piece in self.all_pieces:
-            piece.calculate_moves()
-            piece.check_legal()
+        self.get_possible_moves()
 
         # MAIN LOOP
         while self.running:
@@ -427,6 +559,10 @@ class Board:
                 elif event.type == pygame.KEYDOWN:
                     if event.key == pygame.K_n: self.mixer.next()
                     if event.key == pygame.K_m: self.win()
+                    if event.key == pygame.K_BACKSPACE: self.ask_takeback()
+                    if event.key == pygame.K_b: self.show_book = not self.show_book
+                    if event.key == pygame.K_t: self.show_result = not self.show_result
+                    if event.key == pygame.K_a: self.toggle_analysis()
 
                 # INTERACT UNLESS THERE IS A WINNER
                 if not self.winner:
@@ -441,23 +577,29 @@ class Board:
             self.show()
             pygame.display.update()
             self.dt = self.clock.tick(self.fps)
+
+        self.save_game()
+
+        # THE ANALYSIS PROCESS ENDS WITH THE BOARD, IT IS DAEMONIC IF THE LOOP FAILS
+        if self.analyst: self.analyst.close()
+        self.analyst = None
+        self.analysis = False
         
     def tick(self) -> None:
         """Ticks the clock"""
         self.dt = self.clock.tick(self.fps)
     
-    def promote(self, pawn, promotion_piece) -> None:
-        """Promotes a pawn"""
+    def promote(self, pawn, kind: int):
+        """Replaces a pawn with the piece it promotes to, reusing it after a takeback"""
         screen = self.screen.screen
-
-        # print(self)
         x, y = pawn.x, pawn.y
         self.kill(x, y)
-        new_piece = promotion_piece(self, screen, self.path, x, y, self.current)
-        if self.current == 'white': self.white_pieces.append(new_piece)
-        elif self.current == 'black': self.black_pieces.append(new_piece)
-        self.all_pieces.append(new_piece)
-        self.board[y][x] = new_piece
+        if (pawn, kind) not in self.promotions:
+            self.promotions[(pawn, kind)] = PIECES[kind](self, screen, self.path, x, y, pawn.team)
+        new_piece = self.promotions[(pawn, kind)]
+        new_piece.move((x, y))
+        self.put(new_piece)
+        return new_piece
 
     def intro(self) -> None:
         """Loop for the intro animation"""
@@ -518,7 +660,78 @@ class OfflineBoard(Board):
         super().__init__(screen, mixer, path)
 
 
+class EngineBoard(OfflineBoard):
+    """Offline board where the machine plays the empire from a background process"""
+    site = 'motor'
+
+    def __init__(self, screen: pygame.Surface, mixer: Mixer, path: str):
+        super().__init__(screen, mixer, path)
+
+        # ENGINE
+        self.engine_team = 'black'
+        self.worker = EngineWorker(ENGINE_HASH_MB, self.book_path, self.tablebase_path)
+
+    def reset(self, fen: str=START_FEN) -> None:
+        """Resets the board, cancelling the engine and its last report"""
+        super().reset(fen)
+        self.worker.stop()
+        self.pv = list()
+        self.report = None
+        self.report_rect = None
+
+    def change_turn(self) -> None:
+        """Ponders the expected position while the player thinks"""
+        super().change_turn()
+        if self.winner: return self.worker.stop()
+        if self.current != self.engine_team: self.worker.ponder(self.ponder_fen())
+
+    def ponder_fen(self) -> str:
+        """Returns the position after the reply the engine expects, the current one if it has none"""
+        position = Position(self.position.fen())
+        if len(self.pv) > 1 and self.pv[1] in self.legal_moves: position.make(self.pv[1])
+        return position.fen()
+
+    def show_report(self, depth: int, nps: float, hit_rate: float) -> None:
+        """Renders the depth reached and the speed of the last search"""
+        message = f'profundidad {depth} - {nps:,.0f} nodos/s - {hit_rate:.0%} en tabla'.upper()
+        self.report = self.info_font.render(message, True, 'white')
+        self.report_rect = self.report.get_rect(bottomleft=(self.screen.convert(20), self.screen.height - self.screen.convert(20)))
+
+    def update(self, dt: int=0) -> None:
+        """Updates the visual elements, starts the engine on its turn and plays its move once ready"""
+        super().update(dt)
+        if self.winner or self.current != self.engine_team: return
+        if not self.worker.thinking: self.worker.go(self.position.fen(), ENGINE_SECONDS)
+        if not (result := self.worker.poll()): return
+        move, depth, nps, hit_rate, self.pv = result
+        self.show_report(depth, nps, hit_rate)
+        self.play(move)
+
+    def click(self, event: pygame.event) -> None:
+        """Only the exit button works while the engine is to move"""
+        if self.current == self.engine_team: return self.exit_button.click(event)
+        super().click(event)
+
+    def ask_takeback(self) -> None:
+        """Takes back the move of the engine and the last one of the player"""
+        self.worker.stop()
+        self.takeback()
+        if self.current == self.engine_team: self.takeback()
+
+    def main(self) -> None:
+        """Main loop of the board, the engine process ends with it"""
+        try: super().main()
+        finally: self.worker.close()
+
+    def show(self) -> None:
+        """Draws the board and the report of the engine"""
+        super().show()
+        if self.report: self.screen.blit(self.report, self.report_rect)
+
+
 class OnlineBoard(Board, client.Client):
+    site = 'en linea'
+
     def __init__(self, screen: pygame.Surface, mixer: Mixer, path: str):
         Board.__init__(self, screen, mixer, path)
         client.Client.__init__(self)
@@ -530,17 +743,9 @@ class OnlineBoard(Board, client.Client):
         if args: function(*eval(args))
         else: function()
 
-    def kill(self, x: int, y: int) -> None:
-        """Removes the piece from the board and plays its sound"""
-        if not (piece := self.get((x, y))): return
-        if piece in self.black_pieces: self.black_pieces.remove(piece)
-        if piece in self.white_pieces: self.white_pieces.remove(piece)
-        self.all_pieces.remove(piece)
-        self.board[y][x] = None
-        self.mixer.play_sound('capture.wav')
-
-        # CHECK IF MATE
-        if isinstance(piece, King): self.send_message(f'win:[]')
+    def ask_takeback(self) -> None:
+        """Both clients take back the move"""
+        self.send_message(f'takeback:[]')
     
     def click(self, event: pygame.event) -> None:
         """Manages all the logic when mouse is clicked"""
@@ -554,85 +759,13 @@ class OnlineBoard(Board, client.Client):
         # GET ALL THE PIECES OF THE CURRENT PLAYER
         current_pieces = getattr(self, f'{self.current}_pieces')
 
-        # APPLY ANY FLAG
-        for piece in current_pieces:
-            piece.check_flag()
-
-        # CHECKS CLICK ON MOVE
+        # CHECKS CLICK ON MOVE, BOTH CLIENTS PLAY IT WHEN THE SERVER BROADCASTS IT
         if self.selected:
-
-            # KING SPECIAL MOVES
-            if isinstance(self.selected, King):
-
-                # LEFT CASTLING
-                if self.selected.can_left_castling and self.selected.left_castling_rect.collidepoint(event.pos):
-                    x, y = self.selected.left_castling
-
-                    self.send_message(f'kill:({x},{y})')
-                    self.send_message(f'move:({self.selected.x},{self.selected.y},{x},{y})')
-                    x0, y0 = self.selected.left_rook
-                    x1, y1 = self.selected.left_rook_end
-                    self.send_message(f'move:({x0},{y0},{x1},{y1})')
-                    self.send_message(f'change_turn:[]', 0.1)
-                    self.selected = None
-                    return self.mixer.play_sound('castle.wav')
-
-                # RIGHT CASTLING
-                elif self.selected.can_right_castling and self.selected.right_castling_rect.collidepoint(event.pos):
-                    x, y = self.selected.right_castling
-                    self.send_message(f'move:({self.selected.x},{self.selected.y},{x},{y})')
-                    x0, y0 = self.selected.right_rook
-                    x1, y1 = self.selected.right_rook_end
-                    self.send_message(f'move:({x0},{y0},{x1},{y1})')
-                    self.send_message(f'change_turn:[]', 0.1)
-                    self.selected = None
-                    return self.mixer.play_sound('castle.wav')
-            
-            elif isinstance(self.selected, Pawn):
-
-                # MOVED TWICE
-                if self.selected.double_move_rect.collidepoint(event.pos) and not self.selected.moved:
-                    self.selected.moved_twice = True
-                    x, y = self.selected.x, self.selected.y
-                    self.send_message(f'update_next_turn:({x},{y},"moved_twice",False)')
-                    x1, y1 = self.selected.double_move
-                    self.send_message(f'move:({x0},{y0},{x1},{y1})')
-                    self.send_message(f'change_turn:[]', 0.1)
-                    self.selected = None
-                    return
-
-                # LEFT EN PASSANT
-                elif self.selected.can_left_passant and self.selected.left_passant_rect.collidepoint(event.pos):
-                    x, y = self.selected.left_passant
-                    self.send_message(f'kill:({x},{y})')
-                    x0, y0 = self.selected.x, self.selected.y
-                    x1, y1 = self.selected.left_passant_end
-                    self.send_message(f'move:({x0},{y0},{x1},{y1})')
-                    self.send_message(f'change_turn:[]', 0.1)
-                    self.selected = None
-                    return
-
-                # RIGHT EN PASSANT
-                elif self.selected.can_right_passant and self.selected.right_passant_rect.collidepoint(event.pos):
-                    x, y = self.selected.right_passant
-                    self.send_message(f'kill:({x},{y})')
-                    x0, y0 = self.selected.x, self.selected.y
-                    x1, y1 = self.selected.right_passant_end
-                    self.send_message(f'move:({x0},{y0},{x1},{y1})')
-                    self.send_message(f'change_turn:[]', 0.1)
-                    self.selected = None
-                    return
-
-            # CHECKS EACH POSSIBLE MOVE AND IF IT WAS CLICKED
             for i, rect in enumerate(self.selected.possible_moves_rects):
                 if not rect.collidepoint(event.pos): continue
-                x0, y0 = self.selected.x, self.selected.y
-                x1, y1 = self.selected.possible_moves[i]
-                self.send_message(f'kill:({x1},{y1})')
-                self.send_message(f'move:({x0},{y0},{x1},{y1})')
-                self.send_message(f'change_turn:[]', 0.1)
+                move = self.selected.get_move(self.selected.possible_moves[i])
                 self.selected = None
-                return
+                return self.send_message(f'play:({move},)')
             
             # IF NOT MOVE WAS SELECTED, THEN WE DESELECT THE PIECE
             self.selected.selected = False
@@ -642,5 +775,4 @@ class OnlineBoard(Board, client.Client):
         for piece in current_pieces:
             if not piece.click(event): continue
             self.selected = piece
-            self.selected.calculate_moves()
-            return self.selected.check_legal()
\ No newline at end of file
+            return
\ No newline at end of file
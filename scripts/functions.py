@@ -1,6 +1,7 @@
 import os
 import sys
 import json
+from collections import OrderedDict
 
 def resource_path(relative_path: str) -> str:
     """ Get absolute path to resource, works for dev and for PyInstaller """
@@ -77,4 +78,40 @@ class Config:
     def update(self, key: str, value: object) -> None:
         """Updates the configuration"""
         self.config[key] = value
-        self.save()
\ No newline at end of file
+        self.save()
+
+
+class LRUCache:
+    """Dictionary that forgets the least recently used keys past its size"""
+    def __init__(self, size: int):
+
+        # PROPERTIES
+        self.size = size
+        self.items = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: object, default: object=None) -> object:
+        """Returns the value of the key and marks it as recently used"""
+        if key not in self.items:
+            self.misses += 1
+            return default
+        self.hits += 1
+        self.items.move_to_end(key)
+        return self.items[key]
+
+    def put(self, key: object, value: object) -> None:
+        """Stores the value, forgetting the oldest key if the cache is full"""
+        self.items[key] = value
+        self.items.move_to_end(key)
+        if len(self.items) > self.size: self.items.popitem(last=False)
+
+    def clear(self) -> None:
+        """Forgets every key"""
+        self.items.clear()
+
+    def __contains__(self, key: object) -> bool:
+        return key in self.items
+
+    def __len__(self) -> int:
+        return len(self.items)
\ No newline at end of file
@@ -50,10 +50,11 @@ class Intro:
 
         # UI
         centerx = self.screen.width/2
-        open_server = ui.Button(screen, self.font, 'Abrir partida', centerx, self.screen.convert(600), self.server)
-        join_server = ui.Button(screen, self.font, 'Unirse a partida', centerx, self.screen.convert(664), self.join_server)
+        open_server = ui.Button(screen, self.font, 'Abrir partida', centerx, self.screen.convert(536), self.server)
+        join_server = ui.Button(screen, self.font, 'Unirse a partida', centerx, self.screen.convert(600), self.join_server)
 
-        solo_play = ui.Button(screen, self.font, 'Partida offline', centerx, self.screen.convert(728), self.solo_play)
+        solo_play = ui.Button(screen, self.font, 'Partida offline', centerx, self.screen.convert(664), self.solo_play)
+        machine_play = ui.Button(screen, self.font, 'Contra la maquina', centerx, self.screen.convert(728), self.machine_play)
 
         instructions = ui.Button(screen, self.font, 'Instrucciones', centerx, self.screen.convert(792), self.instructions)
         greetings = ui.Button(screen, self.font, 'Agradecimientos', centerx, self.screen.convert(856), self.greetings)
@@ -70,6 +71,7 @@ class Intro:
             open_server,
             join_server,
             solo_play,
+            machine_play,
             instructions,
             greetings,
             options,
@@ -138,6 +140,10 @@ class Intro:
         self.running = False
         self.board = board.OfflineBoard
 
+    def machine_play(self) -> None:
+        self.running = False
+        self.board = board.EngineBoard
+
     def server(self) -> None:
         self.show_open_server = True
 
@@ -32,4 +32,25 @@ GREY = pygame.Vector3(65, 63, 65)
 BLUE = pygame.Vector3(16, 115, 230)
 GREEN = pygame.Vector3(66, 226, 154)
 YELLOW = pygame.Vector3(204, 179, 97)
-MAGENTA = 0.5*RED + 0.5*BLUE
\ No newline at end of file
+MAGENTA = 0.5*RED + 0.5*BLUE
+
+# DEBUG, CROSS CHECKS THE INCREMENTAL MOVES AGAINST A FULL GENERATION
+CHECK_MOVES = False
+
+# ENGINE, SECONDS THE MACHINE THINKS EACH MOVE AND MEGABYTES OF ITS TRANSPOSITION TABLE
+ENGINE_SECONDS = 3
+ENGINE_HASH_MB = 64
+
+# OPENING BOOK AND ENDGAME TABLES, RELATIVE TO THE GAME FOLDER
+ENGINE_BOOK = 'engine/book.bin'
+ENGINE_TABLEBASES = 'engine/tablebases'
+
+# FINISHED GAMES ARE APPENDED AS PGN AND EVERY GAME TO THE ARCHIVE, RELATIVE TO THE GAME FOLDER
+GAMES_PGN = 'games.pgn'
+GAMES_ARCHIVE = 'games.scga'
+
+# ANALYSIS, SECONDS AND MEGABYTES OF EACH POSITION AND CENTIPAWNS BELOW THE BEST MOVE THAT TURN A MOVE FULLY RED
+ANALYSIS_SECONDS = 1
+ANALYSIS_HASH_MB = 16
+ANALYSIS_RANGE = 300
+ANALYSIS_COLORS = 8